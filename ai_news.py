@@ -1,14 +1,31 @@
+from __future__ import annotations
+
 import os
+import io
 import json
+import string
+import math
+import hashlib
 import time
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-import firebase_admin
-from firebase_admin import db, credentials
-from apscheduler.schedulers.background import BackgroundScheduler
-from PIL import Image, ImageDraw, ImageFont
 from dotenv import load_dotenv
+from article_store import ArticleStore, content_hash, normalize_url
+from http_client import RETRY_STATUSES, get_client, retry_after
+from lazy_modules import LazyModule
+from instrumentation import SPANS, span, timed
+from async_scheduler import AsyncScheduler, DailyJob, parse_times
+
+# Pillow is imported when the first card is drawn; Firebase and the
+# scheduler are imported by the stages that use them
+Image = LazyModule("PIL.Image")
+ImageChops = LazyModule("PIL.ImageChops")
+ImageDraw = LazyModule("PIL.ImageDraw")
+ImageFont = LazyModule("PIL.ImageFont")
+ImageStat = LazyModule("PIL.ImageStat")
 
 # Load configuration
 load_dotenv()
@@ -30,34 +47,81 @@ FIREBASE_CONFIG = {
 
 NEWS_API_KEY = os.getenv("NEWS_API_KEY", "YOUR_NEWS_API_KEY")
 PUBLISH_TIME = os.getenv("PUBLISH_TIME", "09:00")
-
-# Initialize Firebase correctly
-try:
-    if not firebase_admin.get_app():
-        firebase_admin.initialize_app(options={
-            'databaseURL': FIREBASE_CONFIG['databaseURL']
-        })
-    print("✅ Firebase initialized successfully")
-except Exception as e:
-    print(f"⚠️ Firebase already initialized or error: {e}")
+PUBLISH_TIMES = parse_times(os.getenv("PUBLISH_TIMES", PUBLISH_TIME))  # e.g. "09:00,18:00"
+SCHEDULER_OVERLAP = os.getenv("SCHEDULER_OVERLAP", "skip")  # skip, queue or concurrent
+SCHEDULER_JITTER_SECONDS = float(os.getenv("SCHEDULER_JITTER_SECONDS", "0"))
+SCHEDULER_CATCH_UP_HOURS = float(os.getenv("SCHEDULER_CATCH_UP_HOURS", "6"))  # 0 disables catch-up
+TELEGRAM_ARTICLE_COUNT = int(os.getenv("TELEGRAM_ARTICLE_COUNT", "3"))
+TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv("TELEGRAM_MESSAGES_PER_SECOND", "1"))
+CARD_RENDER_WORKERS = int(os.getenv("CARD_RENDER_WORKERS", "4"))
+TELEGRAM_MEDIA_GROUP = os.getenv("TELEGRAM_MEDIA_GROUP", "1") != "0"  # send cards as albums
+CARD_FORMATS = os.getenv("CARD_FORMATS", "png,png8,jpeg").split(",")  # png, png8, webp, jpeg
+CARD_BYTE_BUDGET = int(os.getenv("CARD_BYTE_BUDGET", "250000"))
+CARD_MIN_PSNR = float(os.getenv("CARD_MIN_PSNR", "38"))  # dB, quality floor for lossy encodings
+FIREBASE_KEEP_DAYS = float(os.getenv("FIREBASE_KEEP_DAYS", "7"))  # older stories are removed from the webpage
 
 OUTPUT_DIR = Path("./news_images")
 OUTPUT_DIR.mkdir(exist_ok=True)
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "./cache"))
+CACHE_DIR.mkdir(exist_ok=True)
+
+_article_store = None
+
+
+def get_article_store():
+    global _article_store
+    if _article_store is None:
+        _article_store = ArticleStore(str(CACHE_DIR / "comic_articles.sqlite3"),
+                                      int(os.getenv("ARTICLE_STORE_TTL_DAYS", "30")))
+    return _article_store
 
 WEBHOOK_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
 
-print("=" * 60)
-print("🎨 AI NEWS COMIC GENERATOR & WEBPAGE UPDATER")
-print("=" * 60)
-print(f"📍 Firebase URL: {FIREBASE_CONFIG['databaseURL']}")
-print(f"📰 News API Key: {'✅' if NEWS_API_KEY != 'YOUR_NEWS_API_KEY' else '❌ NOT SET'}")
-print(f"📱 Telegram Token: {'✅' if TELEGRAM_BOT_TOKEN != 'YOUR_BOT_TOKEN' else '❌ NOT SET'}")
-print("=" * 60 + "\n")
+_firebase_lock = threading.Lock()
+
+
+def init_firebase():
+    """Initialize the default Firebase app on first use"""
+    import firebase_admin
+    
+    with _firebase_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            pass
+        try:
+            app = firebase_admin.initialize_app(options={
+                'databaseURL': FIREBASE_CONFIG['databaseURL']
+            })
+            print("✅ Firebase initialized successfully")
+            return app
+        except Exception as e:
+            print(f"⚠️ Firebase initialization error: {e}")
+            raise
+
+
+def firebase_reference(path):
+    """Realtime Database reference, initializing Firebase if needed"""
+    from firebase_admin import db
+    
+    init_firebase()
+    return db.reference(path)
+
+
+def print_banner():
+    print("=" * 60)
+    print("🎨 AI NEWS COMIC GENERATOR & WEBPAGE UPDATER")
+    print("=" * 60)
+    print(f"📍 Firebase URL: {FIREBASE_CONFIG['databaseURL']}")
+    print(f"📰 News API Key: {'✅' if NEWS_API_KEY != 'YOUR_NEWS_API_KEY' else '❌ NOT SET'}")
+    print(f"📱 Telegram Token: {'✅' if TELEGRAM_BOT_TOKEN != 'YOUR_BOT_TOKEN' else '❌ NOT SET'}")
+    print("=" * 60 + "\n")
 
 # ============================================================
 # STEP 1: FETCH AI NEWS FROM NEWS API
 # ============================================================
 
+@timed("newsapi.fetch_ai_news")
 def fetch_ai_news(num_articles=10):
     """Fetch latest AI news from NewsAPI"""
     print("\n📰 Fetching AI news...")
@@ -72,7 +136,7 @@ def fetch_ai_news(num_articles=10):
             'apiKey': NEWS_API_KEY
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = get_client().get(url, params=params)
         data = response.json()
         
         if 'articles' not in data:
@@ -91,105 +155,344 @@ def fetch_ai_news(num_articles=10):
 # STEP 2: CATEGORIZE NEWS
 # ============================================================
 
+# Keyword table: category -> (emoji, keywords). Earlier categories win ties.
+CATEGORY_KEYWORDS = {
+    'breaking': ('🚀', ['nvidia', 'gpu', 'chip', 'breakthrough', 'announces']),
+    'ai': ('🤖', ['openai', 'gpt', 'llm', 'language model', 'ai']),
+    'cloud': ('☁️', ['aws', 'azure', 'cloud', 'google cloud']),
+    'crypto': ('💰', ['bitcoin', 'crypto', 'blockchain', 'ethereum']),
+}
+DEFAULT_CATEGORY = 'ai'
+
+if os.getenv("CATEGORY_KEYWORDS_FILE"):
+    with open(os.getenv("CATEGORY_KEYWORDS_FILE")) as f:
+        CATEGORY_KEYWORDS = {k: tuple(v) for k, v in json.load(f).items()}
+
+
+class NewsCategorizer:
+    """Scores every category from one tokenization of the lowercased text.
+    
+    Keywords are matched as whole-word sequences: single words with one dict
+    lookup per token, multi-word keywords only where their first word occurs,
+    longest first so "google cloud" wins over "cloud". Punctuation is treated
+    as whitespace, in keywords as well as in the text.
+    """
+    
+    # The same table splits keywords and text, so both tokenize identically
+    _PUNCTUATION = str.maketrans({c: ' ' for c in string.punctuation + '‘’“”–—…«»'})
+    
+    @classmethod
+    def tokenize(cls, text):
+        return text.lower().translate(cls._PUNCTUATION).split()
+    
+    def __init__(self, keyword_table, default_category=DEFAULT_CATEGORY, cache_size=4096):
+        self.emojis = {category: emoji for category, (emoji, _) in keyword_table.items()}
+        self.order = list(keyword_table)
+        self._rank = {category: -i for i, category in enumerate(self.order)}
+        self.default_category = default_category
+        self._words = {}    # word -> category
+        self._phrases = {}  # first word -> [(words, category)], longest first
+        for category, (_, keywords) in keyword_table.items():
+            for keyword in keywords:
+                words = tuple(self.tokenize(keyword))
+                if len(words) == 1:
+                    self._words.setdefault(words[0], category)
+                elif words and not any(words == w for w, _ in self._phrases.get(words[0], ())):
+                    self._phrases.setdefault(words[0], []).append((words, category))
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+        self.categorize = lru_cache(maxsize=cache_size)(self._categorize)
+    
+    def scores(self, text):
+        """Keyword hit count per category"""
+        tokens = self.tokenize(text)
+        hits = list(map(self._words.get, tokens))
+        if self._phrases and not self._phrases.keys().isdisjoint(tokens):
+            i = 0
+            while i < len(tokens):
+                for words, category in self._phrases.get(tokens[i], ()):
+                    if tuple(tokens[i:i + len(words)]) == words:
+                        # The phrase replaces the single-word hits it contains
+                        hits[i:i + len(words)] = [category] + [None] * (len(words) - 1)
+                        i += len(words)
+                        break
+                else:
+                    i += 1
+        
+        counts = dict.fromkeys(self.order, 0)
+        for category in filter(None, hits):
+            counts[category] += 1
+        return counts
+    
+    def _categorize(self, title, description=""):
+        counts = self.scores(f"{title} {description}")
+        best = max(self.order, key=lambda category: (counts[category], self._rank[category]))
+        if not counts[best]:
+            best = self.default_category
+        return best, self.emojis[best]
+    
+    def categorize_batch(self, articles):
+        """Categorize NewsAPI-style article dicts"""
+        return [
+            self.categorize(article.get('title') or '', article.get('description') or '')
+            for article in articles
+        ]
+
+
+CATEGORIZER = NewsCategorizer(CATEGORY_KEYWORDS)
+
+
 def categorize_news(title, description=""):
     """Categorize news into: breaking, ai, cloud, crypto"""
-    text = (title + " " + description).lower()
-    
-    if any(word in text for word in ['nvidia', 'gpu', 'chip', 'breakthrough', 'announces']):
-        return 'breaking', '🚀'
-    elif any(word in text for word in ['openai', 'gpt', 'llm', 'language model', 'ai']):
-        return 'ai', '🤖'
-    elif any(word in text for word in ['aws', 'azure', 'cloud', 'google cloud']):
-        return 'cloud', '☁️'
-    elif any(word in text for word in ['bitcoin', 'crypto', 'blockchain', 'ethereum']):
-        return 'crypto', '💰'
-    else:
-        return 'ai', '🤖'
+    return CATEGORIZER.categorize(title or '', description or '')
 
 # ============================================================
 # STEP 3: CREATE COMIC-STYLE IMAGE
 # ============================================================
 
-def create_comic_news_card(title, description, category, emoji, source, date, output_path):
-    """Generate comic-style news card image"""
+# Color schemes by category
+CARD_COLORS = {
+    'breaking': {'bg': '#ff6b6b', 'accent': '#cc0000'},
+    'ai': {'bg': '#00d4ff', 'accent': '#0088ff'},
+    'cloud': {'bg': '#2ecc71', 'accent': '#27ae60'},
+    'crypto': {'bg': '#f39c12', 'accent': '#e67e22'}
+}
+
+CARD_FONTS = {
+    'title': ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 48),
+    'desc': ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 28),
+    'category': ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24),
+    'meta': ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 20),
+}
+
+
+class CardRenderer:
+    """Renders comic news cards, loading fonts and measuring words only once"""
     
-    # Color schemes by category
-    colors = {
-        'breaking': {'bg': '#ff6b6b', 'accent': '#cc0000'},
-        'ai': {'bg': '#00d4ff', 'accent': '#0088ff'},
-        'cloud': {'bg': '#2ecc71', 'accent': '#27ae60'},
-        'crypto': {'bg': '#f39c12', 'accent': '#e67e22'}
-    }
+    def __init__(self, width=1200, height=700):
+        self.width = width
+        self.height = height
+        try:
+            self.fonts = {key: ImageFont.truetype(path, size) for key, (path, size) in CARD_FONTS.items()}
+        except:
+            self.fonts = {key: ImageFont.load_default() for key in CARD_FONTS}
+        self._word_widths = {}
     
-    color = colors.get(category, colors['ai'])
+    def text_width(self, font_key, text):
+        """Rendered width of text, cached per font"""
+        key = (font_key, text)
+        width = self._word_widths.get(key)
+        if width is None:
+            width = self._word_widths[key] = self.fonts[font_key].getlength(text)
+        return width
     
-    # Create image (high quality for attractive look)
-    width, height = 1200, 700
-    img = Image.new('RGB', (width, height), 'white')
-    draw = ImageDraw.Draw(img)
+    def wrap(self, text, font_key, max_width):
+        """Greedy word wrap in one pass using cumulative word widths"""
+        space = self.text_width(font_key, ' ')
+        lines = []
+        current = []
+        current_width = 0
+        
+        for word in text.split():
+            word_width = self.text_width(font_key, word)
+            candidate = current_width + space + word_width if current else word_width
+            if current and candidate > max_width:
+                lines.append(' '.join(current))
+                current = [word]
+                current_width = word_width
+            else:
+                current.append(word)
+                current_width = candidate
+        
+        if current:
+            lines.append(' '.join(current))
+        return lines
     
-    # Load fonts
-    try:
-        title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 48)
-        desc_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 28)
-        category_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-        meta_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 20)
-    except:
-        title_font = ImageFont.load_default()
-        desc_font = ImageFont.load_default()
-        category_font = ImageFont.load_default()
-        meta_font = ImageFont.load_default()
-    
-    # Draw colored background header
-    draw.rectangle([(0, 0), (width, 150)], fill=color['bg'])
-    
-    # Draw emoji
-    emoji_text = emoji
-    draw.text((50, 30), emoji_text, fill='white', font=title_font)
-    
-    # Draw category badge
-    draw.text((200, 50), f"[{category.upper()}]", fill='white', font=category_font)
-    
-    if category == 'breaking':
-        draw.text((900, 40), "🔴 BREAKING", fill='white', font=category_font)
-    
-    # Draw title (with word wrapping)
-    title_words = title.split()
-    title_lines = []
-    current_line = []
-    
-    for word in title_words:
-        current_line.append(word)
-        line = ' '.join(current_line)
-        bbox = draw.textbbox((0, 0), line, font=title_font)
-        if bbox[2] > width - 100:
-            if len(current_line) > 1:
-                current_line.pop()
-                title_lines.append(' '.join(current_line))
-                current_line = [word]
-        else:
-            if len(title_words) == title_words.index(word) + 1:
-                title_lines.append(line)
+    def render(self, title, description, category, emoji, source, date):
+        """Draw a card and return it as a PIL image"""
+        # Create image (high quality for attractive look)
+        img = Image.new('RGB', (self.width, self.height), 'white')
+        draw = ImageDraw.Draw(img)
+        self._draw_header(draw, category, emoji)
+        self._draw_body(draw, title, description)
+        self._draw_footer_band(draw)
+        self._draw_meta(draw, source, date)
+        self._draw_border(draw)
+        return img
     
-    y_pos = 180
-    for line in title_lines[:3]:
-        draw.text((50, y_pos), line, fill='#333', font=title_font)
-        y_pos += 60
+    @timed("cards.draw_header", emit=False)
+    def _draw_header(self, draw, category, emoji):
+        color = CARD_COLORS.get(category, CARD_COLORS['ai'])
+        
+        # Draw colored background header
+        draw.rectangle([(0, 0), (self.width, 150)], fill=color['bg'])
+        
+        # Draw emoji
+        draw.text((50, 30), emoji, fill='white', font=self.fonts['title'])
+        
+        # Draw category badge
+        draw.text((200, 50), f"[{category.upper()}]", fill='white', font=self.fonts['category'])
+        
+        if category == 'breaking':
+            draw.text((900, 40), "🔴 BREAKING", fill='white', font=self.fonts['category'])
     
-    # Draw description (truncated)
-    desc_text = description[:150] + "..." if len(description) > 150 else description
-    draw.text((50, y_pos + 30), desc_text, fill='#666', font=desc_font)
+    @timed("cards.draw_body", emit=False)
+    def _draw_body(self, draw, title, description):
+        # Draw title (with word wrapping)
+        y_pos = 180
+        for line in self.wrap(title, 'title', self.width - 100)[:3]:
+            draw.text((50, y_pos), line, fill='#333', font=self.fonts['title'])
+            y_pos += 60
+        
+        # Draw description (truncated)
+        desc_text = description[:150] + "..." if len(description) > 150 else description
+        draw.text((50, y_pos + 30), desc_text, fill='#666', font=self.fonts['desc'])
     
-    # Draw source and date at bottom
-    draw.rectangle([(0, height-80), (width, height)], fill='#f5f5f5')
-    draw.text((50, height-60), f"📰 {source} | 📅 {date}", fill='#666', font=meta_font)
+    @timed("cards.draw_footer_band", emit=False)
+    def _draw_footer_band(self, draw):
+        draw.rectangle([(0, self.height-80), (self.width, self.height)], fill='#f5f5f5')
     
-    # Draw border (comic style)
-    draw.rectangle([(2, 2), (width-2, height-2)], outline='#000', width=4)
+    @timed("cards.draw_meta", emit=False)
+    def _draw_meta(self, draw, source, date):
+        # Draw source and date at bottom
+        draw.text((50, self.height-60), f"📰 {source} | 📅 {date}", fill='#666', font=self.fonts['meta'])
+    
+    @timed("cards.draw_border", emit=False)
+    def _draw_border(self, draw):
+        # Draw border (comic style)
+        draw.rectangle([(2, 2), (self.width-2, self.height-2)], outline='#000', width=4)
+    
+    def render_batch(self, cards, workers=None):
+        """Render many cards (dicts of render() arguments), optionally in threads"""
+        if not workers or workers <= 1:
+            return [self.render(**card) for card in cards]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda card: self.render(**card), cards))
+
+
+_card_renderer = None
+_card_renderer_lock = threading.Lock()
+
+
+def get_card_renderer():
+    """Shared renderer, created on first use"""
+    global _card_renderer
+    with _card_renderer_lock:
+        if _card_renderer is None:
+            _card_renderer = CardRenderer()
+        return _card_renderer
+
+
+def psnr(reference, candidate):
+    """Peak signal-to-noise ratio in dB between two images"""
+    diff = ImageChops.difference(reference.convert('RGB'), candidate.convert('RGB'))
+    rms = ImageStat.Stat(diff).rms
+    mse = sum(r * r for r in rms) / len(rms)
+    return float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+class CardEncoder:
+    """Encodes a card in the first of `formats` that fits the byte budget.
     
-    # Save image
-    img.save(output_path)
-    print(f"  ✅ Created: {output_path}")
+    Formats are tried in order and the first one above the quality floor and
+    within the budget wins, so the usual card costs a single PNG save. Only
+    over-budget cards go on to the later formats, where the smallest acceptable
+    candidate wins and a lossy ladder stops at any rung no smaller than it;
+    `over_budget` flags the cards that no format brought under the budget.
+    """
+    
+    EXTENSIONS = {'png': '.png', 'png8': '.png', 'webp': '.webp', 'jpeg': '.jpg'}
+    QUALITIES = (70, 75, 80, 85, 90, 95)
+    
+    def __init__(self, formats=CARD_FORMATS, byte_budget=CARD_BYTE_BUDGET, min_psnr=CARD_MIN_PSNR):
+        unknown = set(formats) - set(self.EXTENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown card formats: {', '.join(sorted(unknown))}")
+        self.formats = formats
+        self.byte_budget = byte_budget
+        self.min_psnr = min_psnr
+    
+    def over_budget(self, data):
+        return len(data) > self.byte_budget
+    
+    @staticmethod
+    def _save(img, **params):
+        buf = io.BytesIO()
+        img.save(buf, **params)
+        return buf.getvalue()
+    
+    def _ladder(self, img, params, best_size):
+        """(data, psnr) of the lowest acceptable quality, or None.
+        
+        Size grows with quality, so the first rung above the floor is the
+        smallest one, and a rung no smaller than best_size ends the climb.
+        """
+        for quality in self.QUALITIES:
+            data = self._save(img, quality=quality, **params)
+            if len(data) >= best_size:
+                return None
+            quality_db = psnr(img, Image.open(io.BytesIO(data)))
+            if quality_db >= self.min_psnr:
+                return data, quality_db
+        return None
+    
+    def _candidate(self, fmt, img, best_size):
+        """(data, psnr) of fmt if it is acceptable and smaller than best_size, or None"""
+        if fmt == 'png':
+            return self._save(img, format='PNG'), float('inf')
+        if fmt == 'png8':
+            data = self._save(img.quantize(256), format='PNG', optimize=True)
+            if len(data) >= best_size:
+                return None
+            quality_db = psnr(img, Image.open(io.BytesIO(data)))
+            return (data, quality_db) if quality_db >= self.min_psnr else None
+        if fmt == 'webp':
+            return self._ladder(img, {'format': 'WEBP', 'method': 4}, best_size)
+        return self._ladder(img, {'format': 'JPEG', 'optimize': True}, best_size)
+    
+    def encode(self, img):
+        """Returns (format, data, psnr, lossless PNG size or None if not encoded)"""
+        best, png_size = None, None
+        for fmt in self.formats:
+            found = self._candidate(fmt, img, len(best[1]) if best else float('inf'))
+            if found is None:
+                continue
+            if fmt == 'png':
+                png_size = len(found[0])
+            if best is None or len(found[0]) < len(best[1]):
+                best = (fmt, *found)
+            if not self.over_budget(best[1]):
+                break
+        if best is None:
+            best = ('png', self._save(img, format='PNG'), float('inf'))
+            png_size = len(best[1])
+        return (*best, png_size)
+
+
+_card_encoder = None
+
+
+def get_card_encoder():
+    global _card_encoder
+    if _card_encoder is None:
+        _card_encoder = CardEncoder()
+    return _card_encoder
+
+
+def create_comic_news_card(title, description, category, emoji, source, date, output_path):
+    """Generate comic-style news card image; returns the path actually written"""
+    img = get_card_renderer().render(title, description, category, emoji, source, date)
+    
+    # Encode with the first format that meets the quality floor and the byte budget
+    fmt, data, quality_db, png_size = get_card_encoder().encode(img)
+    output_path = Path(output_path).with_suffix(CardEncoder.EXTENSIONS[fmt])
+    output_path.write_bytes(data)
+    
+    quality = 'lossless' if quality_db == float('inf') else f"{quality_db:.1f} dB"
+    saving = f", {(1 - len(data) / png_size) * 100:.0f}% smaller than PNG" if png_size and fmt != 'png' else ""
+    print(f"  ✅ Created: {output_path} ({fmt}, {len(data) / 1024:.0f} KB, {quality}{saving})")
+    if get_card_encoder().over_budget(data):
+        print(f"  ⚠️ {output_path.name} exceeds the {CARD_BYTE_BUDGET // 1000} KB card budget")
     
     return str(output_path)
 
@@ -197,36 +500,159 @@ def create_comic_news_card(title, description, category, emoji, source, date, ou
 # STEP 4: UPDATE FIREBASE (for webpage)
 # ============================================================
 
+class FirebaseNewsSync:
+    """Upserts articles under stable keys, sending only what changed since the last sync.
+    
+    Keys put an inverted publish time before the URL hash, so Firebase's key
+    order is newest first and the webpage's first story is the latest one.
+    The fingerprints of the last synced articles are cached locally so each run
+    can diff without downloading the node; new, changed and expired children
+    all go out in a single multi-path update(). `reference` can be swapped
+    for a fake such as FakeFirebaseReference.
+    """
+    
+    KEY_TIME_LIMIT = 10 ** 10  # publish times are stored as KEY_TIME_LIMIT - 1 - unix seconds
+    
+    def __init__(self, path='news', state_path=CACHE_DIR / "firebase_news_state.json", reference=None,
+                 keep_days=FIREBASE_KEEP_DAYS):
+        self.path = path
+        self.state_path = Path(state_path)
+        self._reference = reference or firebase_reference
+        self.keep_days = keep_days
+        self.state = self._load_state()
+    
+    def _load_state(self):
+        try:
+            return json.loads(self.state_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def _save_state(self):
+        tmp_path = self.state_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.state))
+        tmp_path.replace(self.state_path)
+    
+    @staticmethod
+    def url_hash(article):
+        return hashlib.sha1(normalize_url(article.get('url') or article.get('title', '')).encode()).hexdigest()[:12]
+    
+    @staticmethod
+    def published_timestamp(article):
+        try:
+            return datetime.fromisoformat((article.get('publishedAt') or '').replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+    
+    @classmethod
+    def article_key(cls, url_hash, published):
+        return f"{cls.KEY_TIME_LIMIT - 1 - int(published):010d}-{url_hash}"
+    
+    @classmethod
+    def key_timestamp(cls, key):
+        """Publish time encoded in a key, or None for a legacy hash-only key"""
+        prefix, sep, _ = key.partition('-')
+        if not sep or not prefix.isdigit():
+            return None
+        return cls.KEY_TIME_LIMIT - 1 - int(prefix)
+    
+    def transform(self, article, known_keys=None):
+        """(key, news item) for a NewsAPI article; known_keys maps URL hashes to keys already in use"""
+        category, emoji = categorize_news(article.get('title', ''), article.get('description', ''))
+        url_hash = self.url_hash(article)
+        # Reusing the key keeps an article in place if its publish time is revised or missing
+        key = (known_keys or {}).get(url_hash) or self.article_key(
+            url_hash, self.published_timestamp(article) or time.time())
+        
+        return key, {
+            'id': int(url_hash, 16),
+            'title': article.get('title', 'No title'),
+            'description': (article.get('description') or 'No description')[:200],
+            'category': category,
+            'emoji': emoji,
+            'date': (article.get('publishedAt') or '')[:10],
+            'publishedAt': article.get('publishedAt') or '',
+            'source': article.get('source', {}).get('name', 'Unknown'),
+            'url': article.get('url', '#'),
+            'image': article.get('urlToImage', ''),
+            'fetchedAt': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def fingerprint(item):
+        stable = {k: v for k, v in item.items() if k != 'fetchedAt'}
+        return hashlib.sha1(json.dumps(stable, sort_keys=True).encode()).hexdigest()
+    
+    def sync(self, articles):
+        """Push new or changed articles and drop expired ones; returns (written, removed)"""
+        # Legacy hash-only keys do not sort by time, so those nodes are rewritten from scratch
+        if self.state is not None and any(self.key_timestamp(key) is None for key in self.state):
+            self.state = None
+        
+        known_keys = {key.partition('-')[2]: key for key in self.state or {}}
+        items = dict(self.transform(article, known_keys) for article in articles)
+        fingerprints = {key: self.fingerprint(item) for key, item in items.items()}
+        ref = self._reference(self.path)
+        
+        if self.state is None:
+            # First sync replaces the node, and whatever was under it, with keyed children
+            ref.set(items)
+            changed, expired = items, []
+            self.state = {}
+        else:
+            changed = {key: item for key, item in items.items() if self.state.get(key) != fingerprints[key]}
+            cutoff = time.time() - self.keep_days * 86400
+            expired = [key for key in self.state if key not in items and self.key_timestamp(key) < cutoff]
+            if changed or expired:
+                ref.update({**changed, **dict.fromkeys(expired)})
+        
+        for key in expired:
+            del self.state[key]
+        self.state.update({key: fingerprints[key] for key in changed})
+        self._save_state()
+        return len(changed), len(expired)
+
+
+class FakeFirebaseReference:
+    """In-memory stand-in for a firebase_admin db.Reference.
+    
+    Pass an instance as FirebaseNewsSync's `reference` to sync without
+    Firebase. update() deletes children set to None, get() returns children
+    in key order like the Realtime Database, and `calls` records each write.
+    """
+    
+    def __init__(self, data=None):
+        self.data = dict(data or {})
+        self.calls = []
+    
+    def __call__(self, path):
+        return self
+    
+    def get(self):
+        return dict(sorted(self.data.items())) or None
+    
+    def set(self, value):
+        self.calls.append(('set', len(value)))
+        self.data = {key: child for key, child in value.items() if child is not None}
+    
+    def update(self, value):
+        self.calls.append(('update', len(value)))
+        for key, child in value.items():
+            if child is None:
+                self.data.pop(key, None)
+            else:
+                self.data[key] = child
+
+
+@timed("firebase.update_news")
 def update_firebase_news(news_articles):
-    """Save all news to Firebase for webpage display"""
+    """Save new and changed news to Firebase for webpage display"""
     print("\n💾 Updating Firebase database...")
     
     try:
-        ref = db.reference('news')
+        changed, removed = FirebaseNewsSync().sync(news_articles)
         
-        # Transform articles
-        transformed_news = []
-        for article in news_articles:
-            category, emoji = categorize_news(article.get('title', ''), article.get('description', ''))
-            
-            news_item = {
-                'id': int(time.time() * 1000),
-                'title': article.get('title', 'No title'),
-                'description': article.get('description', 'No description')[:200],
-                'category': category,
-                'emoji': emoji,
-                'date': article.get('publishedAt', '')[:10],
-                'source': article.get('source', {}).get('name', 'Unknown'),
-                'url': article.get('url', '#'),
-                'image': article.get('urlToImage', ''),
-                'fetchedAt': datetime.now().isoformat()
-            }
-            transformed_news.append(news_item)
-        
-        # Save to Firebase
-        ref.set(transformed_news)
-        
-        print(f"✅ Updated Firebase with {len(transformed_news)} articles")
+        print(f"✅ Synced Firebase: {changed} of {len(news_articles)} articles new or changed, "
+              f"{removed} older than {FIREBASE_KEEP_DAYS:g} days removed")
         return True
     
     except Exception as e:
@@ -237,43 +663,230 @@ def update_firebase_news(news_articles):
 # STEP 5: SEND TO TELEGRAM
 # ============================================================
 
-def send_to_telegram(image_path, title, source):
+class TokenBucket:
+    """Thread-safe token bucket that can be paused by a server retry hint"""
+    
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+    
+    def pause(self, seconds):
+        """Hold every sender back, e.g. for Telegram's retry_after"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+TELEGRAM_LIMITER = TokenBucket(TELEGRAM_MESSAGES_PER_SECOND)
+
+
+class TelegramFileIdCache:
+    """Maps card content hashes to Telegram file_ids so each card is uploaded once"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self.file_ids = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            self.file_ids = {}
+    
+    @staticmethod
+    def digest(image_path):
+        return hashlib.sha256(Path(image_path).read_bytes()).hexdigest()
+    
+    def get(self, digest):
+        return self.file_ids.get(digest)
+    
+    def put(self, digest, file_id):
+        with self._lock:
+            self.file_ids[digest] = file_id
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(self.file_ids))
+            tmp_path.replace(self.path)
+
+
+_telegram_file_ids = None
+
+
+def get_telegram_file_ids():
+    global _telegram_file_ids
+    if _telegram_file_ids is None:
+        _telegram_file_ids = TelegramFileIdCache(CACHE_DIR / "telegram_file_ids.json")
+    return _telegram_file_ids
+
+
+def _photo_caption(title, source):
+    return f"📰 {title}\n\n📝 Source: {source}\n\n#AI #News #ComicStyle"
+
+
+def _post_to_telegram(method, data, files=None, limiter=TELEGRAM_LIMITER, max_attempts=5):
+    """POST to the Bot API through the rate limiter, waiting out 429s; returns the response or None"""
+    for attempt in range(max_attempts):
+        limiter.acquire()
+        for f in (files or {}).values():
+            f.seek(0)
+        with span(f"telegram.{method}", attempt=attempt + 1):
+            response = get_client().post(f"{WEBHOOK_URL}/{method}", files=files, data=data,
+                                         retry_statuses=RETRY_STATUSES - {429})
+        
+        if response.status_code != 429:
+            return response
+        
+        wait = retry_after(response) or 1
+        print(f"  ⏳ Telegram rate limit, retrying in {wait:.0f}s")
+        limiter.pause(wait)
+    
+    print(f"  ❌ Telegram rate limit: gave up after {max_attempts} attempts")
+    return None
+
+
+def send_to_telegram(image_path, title, source, limiter=TELEGRAM_LIMITER, max_attempts=5):
     """Send comic image to Telegram channel"""
     try:
-        with open(image_path, 'rb') as photo:
-            files = {'photo': photo}
-            data = {
-                'chat_id': TELEGRAM_CHANNEL_ID,
-                'caption': f"📰 {title}\n\n📝 Source: {source}\n\n#AI #News #ComicStyle",
-                'parse_mode': 'HTML'
-            }
-            
-            response = requests.post(f"{WEBHOOK_URL}/sendPhoto", files=files, data=data, timeout=10)
-            
-            if response.status_code == 200:
-                print(f"  ✅ Sent to Telegram")
-                return True
-            else:
-                print(f"  ❌ Telegram error: {response.text}")
-                return False
+        file_ids = get_telegram_file_ids()
+        digest = file_ids.digest(image_path)
+        file_id = file_ids.get(digest)
+        data = {
+            'chat_id': TELEGRAM_CHANNEL_ID,
+            'caption': _photo_caption(title, source),
+            'parse_mode': 'HTML'
+        }
+        
+        start = time.perf_counter()
+        if file_id:
+            data['photo'] = file_id
+            response = _post_to_telegram('sendPhoto', data, limiter=limiter, max_attempts=max_attempts)
+        else:
+            with open(image_path, 'rb') as photo:
+                response = _post_to_telegram('sendPhoto', data, {'photo': photo},
+                                             limiter=limiter, max_attempts=max_attempts)
+        
+        if response is None:
+            return False
+        
+        if response.status_code == 200:
+            file_ids.put(digest, response.json()['result']['photo'][-1]['file_id'])
+            uploaded = 'reused file_id' if file_id else f"{os.path.getsize(image_path) / 1024:.0f} KB"
+            print(f"  ✅ Sent to Telegram ({uploaded} in {time.perf_counter() - start:.2f}s)")
+            return True
+        else:
+            print(f"  ❌ Telegram error: {response.text}")
+            return False
     
     except Exception as e:
         print(f"  ❌ Error sending to Telegram: {e}")
         return False
 
+
+def send_media_group(cards, limiter=TELEGRAM_LIMITER):
+    """Send 2-10 (image_path, title, source) cards as one album with per-item captions"""
+    if not 2 <= len(cards) <= 10:
+        raise ValueError("sendMediaGroup takes between 2 and 10 items")
+    
+    try:
+        file_ids = get_telegram_file_ids()
+        digests = [file_ids.digest(path) for path, _, _ in cards]
+        media = []
+        files = {}
+        try:
+            for idx, ((image_path, title, source), digest) in enumerate(zip(cards, digests)):
+                item = {'type': 'photo', 'caption': _photo_caption(title, source), 'parse_mode': 'HTML'}
+                file_id = file_ids.get(digest)
+                if file_id:
+                    item['media'] = file_id
+                else:
+                    name = f"photo{idx}"
+                    item['media'] = f"attach://{name}"
+                    files[name] = open(image_path, 'rb')
+                media.append(item)
+            
+            start = time.perf_counter()
+            data = {'chat_id': TELEGRAM_CHANNEL_ID, 'media': json.dumps(media)}
+            response = _post_to_telegram('sendMediaGroup', data, files or None, limiter=limiter)
+        finally:
+            for f in files.values():
+                f.close()
+        
+        if response is None or response.status_code != 200:
+            print(f"  ❌ Telegram album error: {response.text if response is not None else 'rate limited'}")
+            return False
+        
+        for message, digest in zip(response.json()['result'], digests):
+            file_ids.put(digest, message['photo'][-1]['file_id'])
+        print(f"  ✅ Sent album of {len(cards)} cards ({len(files)} uploaded) "
+              f"in {time.perf_counter() - start:.2f}s")
+        return True
+    
+    except Exception as e:
+        print(f"  ❌ Error sending album to Telegram: {e}")
+        return False
+
+
+def publish_cards(batch):
+    """Publish (article, card_path) pairs as an album, falling back to single photos.
+    
+    Returns the articles that were delivered.
+    """
+    if len(batch) > 1 and TELEGRAM_MEDIA_GROUP:
+        cards = [(path, article['title'][:50], article['source']['name']) for article, path in batch]
+        if send_media_group(cards):
+            return [article for article, _ in batch]
+        print("  ↩️ Falling back to single photo sends")
+    
+    return [
+        article for article, path in batch
+        if send_to_telegram(path, article['title'][:50], article['source']['name'])
+    ]
+
 # ============================================================
 # STEP 6: MAIN DAILY JOB
 # ============================================================
 
+@timed("cards.render_article_card")
+def render_article_card(idx, article):
+    """Render the comic card for one NewsAPI article; returns its path"""
+    category, emoji = categorize_news(article['title'], article.get('description', ''))
+    
+    output_path = OUTPUT_DIR / f"news_{idx}_{int(time.time())}.png"
+    
+    return create_comic_news_card(
+        title=article['title'],
+        description=article.get('description') or 'No description',
+        category=category,
+        emoji=emoji,
+        source=article['source']['name'],
+        date=article['publishedAt'][:10],
+        output_path=str(output_path)
+    )
+
+
 def daily_news_job():
     """Main job that runs every day"""
     print("\n" + "=" * 60)
     print(f"🤖 Starting Daily AI News Comic Generator")
     print(f"⏰ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 60)
+    span_snapshot = SPANS.totals()
     
     # 1. Fetch news
-    articles = fetch_ai_news(num_articles=10)
+    articles = fetch_ai_news(num_articles=max(10, TELEGRAM_ARTICLE_COUNT))
     
     if not articles:
         print("❌ No articles fetched, skipping...")
@@ -282,79 +895,382 @@ def daily_news_job():
     # 2. Update Firebase (for webpage)
     update_firebase_news(articles)
     
-    # 3. Generate comics and send to Telegram
-    print("\n🎨 Generating comic-style cards...")
-    for idx, article in enumerate(articles[:3], 1):  # Top 3 articles
-        print(f"\n📄 Processing article {idx}/3...")
-        
-        category, emoji = categorize_news(article['title'], article.get('description', ''))
-        
-        output_path = OUTPUT_DIR / f"news_{idx}_{int(time.time())}.png"
-        
-        # Create comic image
-        create_comic_news_card(
-            title=article['title'],
-            description=article.get('description', 'No description'),
-            category=category,
-            emoji=emoji,
-            source=article['source']['name'],
-            date=article['publishedAt'][:10],
-            output_path=str(output_path)
-        )
-        
-        # Send to Telegram
-        send_to_telegram(str(output_path), article['title'][:50], article['source']['name'])
+    # 3. Index articles and keep only stories we have not published yet
+    store = get_article_store()
+    store.compact()
+    for article in articles:
+        if article.get('url'):
+            store.upsert(
+                article['url'],
+                content_hash(article.get('title', ''), article.get('description') or ''),
+                {'title': article.get('title'), 'source': article.get('source', {}).get('name')}
+            )
+    new_articles = [a for a in articles if a.get('url') and not store.is_published(a['url'])]
+    print(f"\n🗂️ {len(new_articles)}/{len(articles)} articles not published yet")
+    
+    # 4. Render cards in a worker pool while earlier cards upload, in order
+    top_articles = new_articles[:TELEGRAM_ARTICLE_COUNT]
+    print(f"\n🎨 Generating {len(top_articles)} comic-style cards...")
+    batch_size = 10 if TELEGRAM_MEDIA_GROUP else 1
+    with ThreadPoolExecutor(max_workers=max(1, CARD_RENDER_WORKERS)) as pool:
+        cards = [pool.submit(render_article_card, idx, article) for idx, article in enumerate(top_articles, 1)]
         
-        time.sleep(1)  # Rate limiting
+        batch = []
+        for idx, (article, card) in enumerate(zip(top_articles, cards), 1):
+            try:
+                batch.append((article, card.result()))
+            except Exception as e:
+                print(f"  ❌ Card rendering failed: {e}")
+            
+            if batch and (len(batch) == batch_size or idx == len(top_articles)):
+                print(f"\n📤 Sending {len(batch)} card(s), up to article {idx}/{len(top_articles)}...")
+                delivered = publish_cards(batch)
+                store.mark_published([a['url'] for a in delivered])
+                batch = []
     
+    get_client().print_stats()
+    SPANS.print_summary(since=span_snapshot)
+    try:
+        SPANS.export_prometheus("comic_spans")
+    except OSError as e:
+        print(f"⚠️ Span export failed: {e}")
     print("\n✅ Daily job completed!")
 
 # ============================================================
 # STEP 7: SCHEDULE DAILY JOB
 # ============================================================
 
+def build_scheduler():
+    scheduler = AsyncScheduler(str(CACHE_DIR / "comic_scheduler_state.json"), metrics_name="comic_scheduler")
+    scheduler.add_job(DailyJob(
+        "comic_news",
+        lambda slot: daily_news_job(),
+        PUBLISH_TIMES,
+        overlap=SCHEDULER_OVERLAP,
+        jitter_seconds=SCHEDULER_JITTER_SECONDS,
+        catch_up_seconds=SCHEDULER_CATCH_UP_HOURS * 3600,
+    ))
+    return scheduler
+
+
 def start_scheduler():
-    """Start background scheduler"""
+    """Run daily_news_job at each publish slot until interrupted"""
     print("\n⏰ Starting scheduler...")
     
-    scheduler = BackgroundScheduler()
-    
-    # Schedule job
-    publish_hour, publish_minute = map(int, PUBLISH_TIME.split(':'))
-    scheduler.add_job(
-        daily_news_job,
-        'cron',
-        hour=publish_hour,
-        minute=publish_minute,
-        id='daily_news_job',
-        name='Daily AI News Comic Generator'
-    )
-    
-    scheduler.start()
+    scheduler = build_scheduler()
     
     print(f"✅ Scheduler started!")
-    print(f"📅 Job scheduled daily at {PUBLISH_TIME}")
     print(f"📍 Telegram Channel: {TELEGRAM_CHANNEL_ID}")
     print(f"🌐 Firebase: Updating webpage automatically")
     print("\n💡 Your webpage will auto-refresh with new comic-style news!")
     print("🔄 Press Ctrl+C to stop\n")
     
+    scheduler.run_forever()
+
+# ============================================================
+# BENCHMARKS
+# ============================================================
+
+def benchmark_categorize(num_articles=10000):
+    """Compare substring scanning with the token scorer, cold and on memo hits"""
+    import random
+    
+    print(f"\n⏱️ Categorization benchmark ({num_articles} articles)\n")
+    words = ("said maintain model launches new chip cloud region bitcoin rally openai "
+             "gpt release startup funding research paper azure outage blockchain").split()
+    rng = random.Random(0)
+    articles = [
+        {'title': ' '.join(rng.choices(words, k=10)), 'description': ' '.join(rng.choices(words, k=30))}
+        for _ in range(num_articles)
+    ]
+    
+    def substring_categorize(title, description):
+        text = (title + " " + description).lower()
+        for category, (emoji, keywords) in CATEGORY_KEYWORDS.items():
+            if any(word in text for word in keywords):
+                return category, emoji
+        return DEFAULT_CATEGORY, CATEGORY_KEYWORDS[DEFAULT_CATEGORY][0]
+    
+    start = time.perf_counter()
+    for article in articles:
+        substring_categorize(article['title'], article['description'])
+    substring_time = time.perf_counter() - start
+    
+    categorizer = NewsCategorizer(CATEGORY_KEYWORDS, cache_size=num_articles)
+    start = time.perf_counter()
+    categorizer.categorize_batch(articles)
+    cold_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    categorizer.categorize_batch(articles)
+    warm_time = time.perf_counter() - start
+    
+    print(f"  Substring scan:        {num_articles / substring_time:10.0f} articles/s")
+    print(f"  Token scorer (cold):   {num_articles / cold_time:10.0f} articles/s")
+    print(f"  Token scorer (memo):   {num_articles / warm_time:10.0f} articles/s")
+
+def benchmark_card_rendering(num_cards=1000):
+    """Compare per-call font loading and quadratic wrapping with the shared renderer"""
+    import random
+    
+    print(f"\n⏱️ Card rendering benchmark ({num_cards} titles)\n")
+    words = ("OpenAI Nvidia unveils new GPU cluster for training frontier language models "
+             "while cloud providers race to expand capacity across regions").split()
+    rng = random.Random(0)
+    cards = [
+        {
+            'title': ' '.join(rng.choices(words, k=rng.randint(6, 18))),
+            'description': ' '.join(rng.choices(words, k=25)),
+            'category': rng.choice(list(CARD_COLORS)),
+            'emoji': '🤖',
+            'source': 'Benchmark',
+            'date': '2024-01-01',
+        }
+        for _ in range(num_cards)
+    ]
+    
+    def quadratic_wrap(renderer, text):
+        # Word wrapping as create_comic_news_card used to do it
+        draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+        title_words = text.split()
+        lines, current_line = [], []
+        for word in title_words:
+            current_line.append(word)
+            line = ' '.join(current_line)
+            if draw.textbbox((0, 0), line, font=renderer.fonts['title'])[2] > renderer.width - 100:
+                if len(current_line) > 1:
+                    current_line.pop()
+                    lines.append(' '.join(current_line))
+                    current_line = [word]
+            elif len(title_words) == title_words.index(word) + 1:
+                lines.append(line)
+        return lines
+    
+    start = time.perf_counter()
+    for card in cards:
+        CardRenderer().render(**card)
+    cold_time = time.perf_counter() - start
+    
+    renderer = CardRenderer()
+    start = time.perf_counter()
+    renderer.render_batch(cards)
+    warm_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for card in cards:
+        quadratic_wrap(renderer, card['title'])
+    quadratic_wrap_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for card in cards:
+        renderer.wrap(card['title'], 'title', renderer.width - 100)
+    linear_wrap_time = time.perf_counter() - start
+    
+    print(f"  Fonts loaded per card:  {num_cards / cold_time:10.1f} cards/s")
+    print(f"  Shared renderer batch:  {num_cards / warm_time:10.1f} cards/s ({cold_time / warm_time:.1f}x)")
+    print(f"  Quadratic title wrap:   {num_cards / quadratic_wrap_time:10.1f} titles/s")
+    print(f"  Cached linear wrap:     {num_cards / linear_wrap_time:10.1f} titles/s "
+          f"({quadratic_wrap_time / linear_wrap_time:.1f}x)")
+
+def check_firebase_sync():
+    """Run FirebaseNewsSync against FakeFirebaseReference; returns True if every check passes"""
+    import tempfile
+    
+    print("\n🧪 Firebase sync self-check (in-memory reference)\n")
+    now = datetime.now().astimezone()
+    
+    def article(n, days_ago, title=None):
+        published = now.timestamp() - days_ago * 86400
+        return {
+            'title': title or f"Story {n}", 'description': 'AI news', 'url': f"https://example.com/{n}",
+            'publishedAt': datetime.fromtimestamp(published).astimezone().isoformat(),
+            'source': {'name': 'Example'},
+        }
+    
+    results = []
+    
+    def check(name, passed):
+        results.append(passed)
+        print(f"  {'✅' if passed else '❌'} {name}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = Path(tmp) / "state.json"
+        legacy = {'0123456789abcdef': {'title': 'Legacy'}}
+        ref = FakeFirebaseReference(legacy)
+        state_path.write_text(json.dumps(dict.fromkeys(legacy, 'fingerprint')))
+        
+        articles = [article(1, 2), article(2, 0), article(3, 1)]
+        FirebaseNewsSync(state_path=state_path, reference=ref).sync(articles)
+        titles = [item['title'] for item in ref.get().values()]
+        check("legacy hash keys replaced in one set()", ref.calls == [('set', 3)] and 'Legacy' not in titles)
+        check("children come back newest first", titles == ['Story 2', 'Story 3', 'Story 1'])
+        
+        ref.calls.clear()
+        written = FirebaseNewsSync(state_path=state_path, reference=ref).sync(articles)
+        check("unchanged articles write nothing", written == (0, 0) and not ref.calls)
+        
+        old = article(4, FIREBASE_KEEP_DAYS + 1)
+        FirebaseNewsSync(state_path=state_path, reference=ref).sync(articles + [old])
+        ref.calls.clear()
+        revised = [article(1, 2, title="Story 1 (updated)"), article(2, 0), article(3, 1)]
+        written = FirebaseNewsSync(state_path=state_path, reference=ref).sync(revised)
+        titles = [item['title'] for item in ref.get().values()]
+        check("edit and expiry go out in one update()",
+              written == (1, 1) and ref.calls == [('update', 2)])
+        check("expired story removed, edited one kept in place",
+              titles == ['Story 2', 'Story 3', 'Story 1 (updated)'])
+    
+    return all(results)
+
+def check_telegram_publishing():
+    """Publish cards against a local Bot API stub; returns True if every check passes"""
+    global WEBHOOK_URL, _telegram_file_ids, TELEGRAM_MEDIA_GROUP
+    import tempfile
+    from email.parser import BytesParser
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+    
+    print("\n🧪 Telegram publishing self-check (local Bot API stub)\n")
+    
+    class StubBotApi(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        reject_albums = False
+        requests = []  # (method, fields, uploaded part names)
+        
+        def do_POST(self):
+            method = self.path.rsplit('/', 1)[-1]
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            content_type = self.headers['Content-Type']
+            fields, uploads = {}, set()
+            if content_type.startswith('multipart/form-data'):
+                message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+                for part in message.get_payload():
+                    name = part.get_param('name', header='content-disposition')
+                    if part.get_filename():
+                        uploads.add(name)
+                    else:
+                        fields[name] = part.get_payload(decode=True).decode()
+            else:
+                fields = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+            StubBotApi.requests.append((method, fields, uploads))
+            
+            def photo(media):
+                name = media.removeprefix('attach://')
+                file_id = f"file-{len(StubBotApi.requests)}-{name}" if name in uploads else media
+                return {'photo': [{'file_id': file_id}]}
+            
+            if method == 'sendMediaGroup' and not StubBotApi.reject_albums:
+                self._reply(200, {'ok': True, 'result': [photo(item['media']) for item in json.loads(fields['media'])]})
+            elif method == 'sendPhoto':
+                self._reply(200, {'ok': True, 'result': photo(fields.get('photo', 'attach://photo'))})
+            else:
+                self._reply(400, {'ok': False, 'description': f"Bad Request: {method} rejected by stub"})
+        
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    results = []
+    
+    def check(name, passed):
+        results.append(passed)
+        print(f"  {'✅' if passed else '❌'} {name}")
+    
+    def sent(method):
+        return [(fields, uploads) for m, fields, uploads in StubBotApi.requests if m == method]
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBotApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved = WEBHOOK_URL, _telegram_file_ids, TELEGRAM_MEDIA_GROUP, TELEGRAM_LIMITER.rate
     try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\n🛑 Scheduler stopped")
-        scheduler.shutdown()
+        with tempfile.TemporaryDirectory() as tmp:
+            WEBHOOK_URL = f"http://127.0.0.1:{server.server_address[1]}/botTEST"
+            _telegram_file_ids = TelegramFileIdCache(Path(tmp) / "file_ids.json")
+            TELEGRAM_MEDIA_GROUP = True
+            TELEGRAM_LIMITER.rate = 1000
+            
+            batch = []
+            for n in range(5):
+                path = Path(tmp) / f"card{n}.png"
+                Image.new('RGB', (64, 64), (n * 40, 100, 200)).save(path)
+                batch.append(({'title': f"Story {n}", 'source': {'name': 'Example'}}, str(path)))
+            
+            delivered = publish_cards(batch[:3])
+            albums = sent('sendMediaGroup')
+            check("3 new cards go out as one album with 3 uploads",
+                  len(delivered) == 3 and len(albums) == 1 and len(albums[0][1]) == 3)
+            
+            StubBotApi.requests.clear()
+            delivered = publish_cards(batch[:3])
+            albums = sent('sendMediaGroup')
+            check("resending the album reuses every file_id",
+                  len(delivered) == 3 and len(albums) == 1 and not albums[0][1]
+                  and all(item['media'].startswith('file-') for item in json.loads(albums[0][0]['media'])))
+            
+            StubBotApi.requests.clear()
+            StubBotApi.reject_albums = True
+            delivered = publish_cards([batch[0], batch[3], batch[4]])
+            photos = sent('sendPhoto')
+            check("a rejected album falls back to single sends",
+                  len(delivered) == 3 and len(sent('sendMediaGroup')) == 1 and len(photos) == 3)
+            check("single sends upload only the cards without a file_id",
+                  [bool(uploads) for _, uploads in photos] == [False, True, True]
+                  and photos[0][0]['photo'].startswith('file-'))
+    finally:
+        WEBHOOK_URL, _telegram_file_ids, TELEGRAM_MEDIA_GROUP, TELEGRAM_LIMITER.rate = saved
+        server.shutdown()
+    
+    return all(results)
 
 # ============================================================
 # RUN
 # ============================================================
 
 if __name__ == "__main__":
-    # Option 1: Run once immediately (for testing)
-    print("\n🧪 Running news fetch immediately for testing...")
-    daily_news_job()
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description="AI news comic generator")
+    parser.add_argument("--benchmark-categorize", type=int, metavar="ARTICLES",
+                        help="benchmark news categorization and exit")
+    parser.add_argument("--benchmark-cards", type=int, metavar="TITLES",
+                        help="benchmark comic card rendering and exit")
+    parser.add_argument("--check-firebase", action="store_true",
+                        help="self-check the Firebase sync against an in-memory reference and exit")
+    parser.add_argument("--check-telegram", action="store_true",
+                        help="self-check album, fallback and file_id reuse against a local Bot API stub and exit")
+    parser.add_argument("--run-once", action="store_true",
+                        help="run the job now for the most recent slot and exit, instead of scheduling")
+    args = parser.parse_args()
+    
+    if args.check_firebase:
+        sys.exit(0 if check_firebase_sync() else 1)
+    
+    if args.check_telegram:
+        sys.exit(0 if check_telegram_publishing() else 1)
+    
+    if args.benchmark_cards:
+        benchmark_card_rendering(args.benchmark_cards)
+        sys.exit(0)
+    
+    if args.benchmark_categorize:
+        benchmark_categorize(args.benchmark_categorize)
+        sys.exit(0)
+    
+    print_banner()
+    
+    if args.run_once:
+        # Through the scheduler, so the run counts as the latest slot and catch-up will not repeat it
+        print("\n🧪 Running news fetch immediately for testing...")
+        sys.exit(0 if build_scheduler().run_once("comic_news") else 1)
     
-    # Option 2: Start scheduler for daily runs
+    # A slot missed while the scheduler was down runs once on startup (SCHEDULER_CATCH_UP_HOURS)
     print("\n" + "=" * 60)
     start_scheduler()
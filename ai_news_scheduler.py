@@ -4,76 +4,129 @@
 # Auto-publishes AI news to Telegram with 3D backgrounds
 # ================================================================
 
-print("📦 Installing packages...")
-import subprocess
-import sys
-import os
-
-packages = [
-    'feedparser', 'beautifulsoup4', 'google-genai', 'requests',
-    'pydantic', 'pillow', 'opencv-python', 'schedule',
-    'numpy', 'imageio'
-]
-
-for pkg in packages:
-    try:
-        __import__(pkg.replace('-', '_'))
-    except ImportError:
-        print(f"  Installing {pkg}...")
-        subprocess.check_call([sys.executable, '-m', 'pip', 'install', '-q', pkg])
-
-try:
-    subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-    print("✅ FFmpeg found")
-except:
-    print("⚠️ FFmpeg not found. Install with: apt-get install ffmpeg")
-
-print("✅ Packages ready!\n")
+from __future__ import annotations
 
 # ================================================================
 # IMPORTS
 # ================================================================
 
+import io
+import os
+import sys
 import json
 import time
 import math
-import requests
-import schedule
+import re
+import glob
+import hashlib
+import importlib.util
+import shutil
+import tempfile
+import threading
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 from pydantic import BaseModel
-import feedparser
-from google import genai
 import subprocess as sp
-import numpy as np
-import cv2
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import multiprocessing
+from multiprocessing import shared_memory
+from article_store import ArticleStore, content_hash
+from http_client import backoff_delay, get_client
+from instrumentation import SPANS, profile_section, set_profile_mode, span, timed, write_prometheus_textfile
+from lazy_modules import LazyModule
+from pipeline import Stage, StageError, StagePipeline
+from async_scheduler import AsyncScheduler, DailyJob, parse_times
+
+# Heavy dependencies are imported by the stage that first uses them
+np = LazyModule("numpy")
+cv2 = LazyModule("cv2")
+bs4 = LazyModule("bs4")
+feedparser = LazyModule("feedparser")
+genai = LazyModule("google.genai")
+
+# pip package -> import name
+REQUIRED_PACKAGES = {
+    'feedparser': 'feedparser',
+    'beautifulsoup4': 'bs4',
+    'google-genai': 'google.genai',
+    'requests': 'requests',
+    'pydantic': 'pydantic',
+    'opencv-python': 'cv2',
+    'numpy': 'numpy',
+}
+
+
+def check_dependencies() -> bool:
+    """Verify packages and ffmpeg are available without importing anything"""
+    print("📦 Checking dependencies...")
+    missing = []
+    for package, module in REQUIRED_PACKAGES.items():
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except ModuleNotFoundError:
+            found = False
+        if not found:
+            missing.append(package)
+
+    for tool in ('ffmpeg', 'ffprobe'):
+        if shutil.which(tool) is None:
+            print(f"⚠️ {tool} not found. Install with: apt-get install ffmpeg")
+
+    if missing:
+        print(f"❌ Missing packages: pip install {' '.join(missing)}\n")
+        return False
+
+    print("✅ Packages ready!\n")
+    return True
 
 # ================================================================
 # CONFIGURATION - UPDATE THESE WITH YOUR VALUES
 # ================================================================
 
-print("🔑 Loading configuration...\n")
-
 # ⚠️ REQUIRED: Replace with your actual API keys
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID", "YOUR_TELEGRAM_CHANNEL_ID")
+# Optional comma-separated fan-out list; the video is uploaded once and reused
+TELEGRAM_CHANNEL_IDS = [c.strip() for c in os.getenv("TELEGRAM_CHANNEL_IDS", TELEGRAM_CHANNEL_ID).split(",") if c.strip()]
 
 # Settings
 PUBLISH_TIME = "09:00"
+PUBLISH_TIMES = parse_times(os.getenv("PUBLISH_TIMES", PUBLISH_TIME))  # e.g. "09:00,18:00"
+SCHEDULER_OVERLAP = os.getenv("SCHEDULER_OVERLAP", "skip")  # skip, queue or concurrent
+SCHEDULER_JITTER_SECONDS = float(os.getenv("SCHEDULER_JITTER_SECONDS", "0"))
+SCHEDULER_CATCH_UP_HOURS = float(os.getenv("SCHEDULER_CATCH_UP_HOURS", "6"))  # 0 disables catch-up
+STREAM_FRAMES = os.getenv("STREAM_FRAMES", "1") != "0"  # pipe raw frames to ffmpeg instead of PNGs
+SINGLE_PASS_ENCODE = os.getenv("SINGLE_PASS_ENCODE", "1") != "0"  # one ffmpeg run for video, text and audio
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "1"))  # background render processes
 ENABLE_AUDIO = bool(ELEVENLABS_API_KEY and ELEVENLABS_API_KEY != "")
 HASHTAGS = "#AI #ArtificialIntelligence #Tech #News #TechNews #Innovation #ML #MachineLearning"
 
 # Directories
 OUTPUT_DIR = "./videos"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-print(f"✅ Configuration loaded")
-print(f"  📱 Telegram Channel: {TELEGRAM_CHANNEL_ID}")
-print(f"  ⏰ Publish time: {PUBLISH_TIME}")
-print(f"  🔊 Audio: {'✅' if ENABLE_AUDIO else '❌'}\n")
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Background clip cache
+USE_BACKGROUND_CACHE = os.getenv("USE_BACKGROUND_CACHE", "1") != "0"
+BACKGROUND_CACHE_DIR = os.path.join(CACHE_DIR, "backgrounds")
+BACKGROUND_CACHE_SECONDS = int(os.getenv("BACKGROUND_CACHE_SECONDS", "90"))  # also the speculative render length
+SPECULATIVE_RENDER = os.getenv("SPECULATIVE_RENDER", "1") != "0"  # render the background while LLM/TTS run
+BACKGROUND_CACHE_MAX_BYTES = int(os.getenv("BACKGROUND_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+BACKGROUND_CACHE_MAX_ENTRIES = int(os.getenv("BACKGROUND_CACHE_MAX_ENTRIES", "4"))
+
+# LLM response cache
+LLM_CACHE_DIR = os.path.join(CACHE_DIR, "llm")
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "24"))
+
+# Text-to-speech cache
+TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(500 * 1024 ** 2)))
+TTS_SEGMENTED = os.getenv("TTS_SEGMENTED", "1") != "0"  # synthesize sentence by sentence
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "3"))
 
 # News sources
 NEWS_SOURCES = [
@@ -83,6 +136,21 @@ NEWS_SOURCES = [
     {"name": "Ars Technica", "feed_url": "https://feeds.arstechnica.com/arstechnica/technology-lab"},
 ]
 
+FEED_TIMEOUT = float(os.getenv("FEED_TIMEOUT", "10"))  # seconds per feed
+# A dead feed would otherwise cost (retries + 1) timeouts plus backoff; the next run retries it anyway
+FEED_RETRIES = int(os.getenv("FEED_RETRIES", "0"))
+FEED_MAX_WORKERS = int(os.getenv("FEED_MAX_WORKERS", "16"))
+FEED_VALIDATORS_PATH = os.path.join(CACHE_DIR, "feed_validators.json")
+ARTICLE_STORE_PATH = os.path.join(CACHE_DIR, "video_articles.sqlite3")
+TELEGRAM_FILE_IDS_PATH = os.path.join(CACHE_DIR, "telegram_video_file_ids.json")
+ARTICLE_STORE_TTL_DAYS = int(os.getenv("ARTICLE_STORE_TTL_DAYS", "30"))
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.4"))  # estimated Jaccard similarity
+
+# Per-run stage checkpoints, keyed by run id (the publish date)
+RUN_CHECKPOINT_DIR = os.path.join(CACHE_DIR, "runs")
+RUN_CHECKPOINT_DAYS = float(os.getenv("RUN_CHECKPOINT_DAYS", "7"))
+SCHEDULER_STATE_PATH = os.path.join(CACHE_DIR, "video_scheduler_state.json")
+
 VIDEO_DIMENSIONS = (1080, 1920)
 FPS = 30
 
@@ -107,65 +175,287 @@ class GeneratedContent(BaseModel):
 # RSS NEWS AGGREGATOR
 # ================================================================
 
+class NearDuplicateClusterer:
+    """Groups articles covering the same story with MinHash signatures and LSH banding.
+
+    Each article is reduced to character shingles of its title and summary.
+    Articles sharing any LSH band bucket become candidate pairs, and pairs
+    whose estimated Jaccard similarity reaches the threshold are merged, so
+    the cost grows with the number of articles rather than the number of pairs.
+    """
+
+    def __init__(self, num_perm: int = 126, bands: int = 42, shingle_size: int = 5,
+                 threshold: float = 0.4, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def _shingles(self, article: NewsArticle) -> set:
+        text = " ".join(re.findall(r"[a-z0-9]+", f"{article.title} {article.summary}".lower()))
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text} if text else set()
+        return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, article: NewsArticle) -> Optional[np.ndarray]:
+        shingles = self._shingles(article)
+        if not shingles:
+            return None
+        hashes = np.fromiter((hash(s) & 0xFFFFFFFFFFFFFFFF for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # Multiply-shift universal hashing, one row per permutation
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1)
+
+    def cluster(self, articles: List[NewsArticle]) -> List[List[int]]:
+        """Indices of articles grouped into near-duplicate clusters"""
+        parent = list(range(len(articles)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        signatures = [self.signature(a) for a in articles]
+        buckets = {}
+        for idx, sig in enumerate(signatures):
+            if sig is None:
+                continue
+            for band in range(self.bands):
+                key = (band, sig[band * self.rows:(band + 1) * self.rows].tobytes())
+                buckets.setdefault(key, []).append(idx)
+
+        checked = set()
+        for members in buckets.values():
+            for pos, first in enumerate(members):
+                for other in members[pos + 1:]:
+                    pair = (first, other)
+                    if pair in checked or find(first) == find(other):
+                        continue
+                    checked.add(pair)
+                    similarity = np.mean(signatures[first] == signatures[other])
+                    if similarity >= self.threshold:
+                        parent[find(other)] = find(first)
+
+        clusters = {}
+        for idx in range(len(articles)):
+            clusters.setdefault(find(idx), []).append(idx)
+        return list(clusters.values())
+
+    def representative(self, articles: List[NewsArticle]) -> NewsArticle:
+        """Earliest report of the story, preferring the most detailed summary on ties"""
+        return min(articles, key=lambda a: (a.published, -len(a.summary)))
+
+
 class RSSNewsAggregator:
-    def __init__(self, sources: List[Dict[str, str]]):
+    def __init__(self, sources: List[Dict[str, str]], validators_path: str = FEED_VALIDATORS_PATH,
+                 store: Optional[ArticleStore] = None):
         self.sources = sources
+        self.validators_path = validators_path
+        self.validators = self._load_validators()
+        self.store = store or ArticleStore(ARTICLE_STORE_PATH, ARTICLE_STORE_TTL_DAYS)
+        self.clusterer = NearDuplicateClusterer(threshold=DUPLICATE_THRESHOLD)
+
+    def _load_validators(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.validators_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_validators(self):
+        tmp_path = f"{self.validators_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.validators, f, indent=2)
+        os.replace(tmp_path, self.validators_path)
 
     def _clean_text(self, text: str) -> str:
         if not text:
             return ""
-        soup = BeautifulSoup(text, 'html.parser')
+        soup = bs4.BeautifulSoup(text, 'html.parser')
         return soup.get_text().replace("...", "").strip()
 
+    def _fetch_feed(self, source: Dict[str, str]):
+        """Conditional GET of one feed; returns (status, parsed feed or None, validators)"""
+        url = source["feed_url"]
+        headers = {}
+        cached = self.validators.get(url, {})
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        with span("rss.fetch_feed", source=source["name"]):
+            response = get_client().get(url, headers=headers, timeout=FEED_TIMEOUT, retries=FEED_RETRIES)
+        if response.status_code == 304:
+            return 304, None, cached
+        response.raise_for_status()
+
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["last_modified"] = response.headers["Last-Modified"]
+        return response.status_code, feedparser.parse(response.content), validators
+
+    def _parse_entries(self, source: Dict[str, str], feed, now: datetime, time_threshold: datetime) -> Tuple[int, int]:
+        """Store new or changed entries; returns (new, known) counts"""
+        new = known = 0
+        for entry in feed.entries:
+            try:
+                if hasattr(entry, 'published_parsed') and entry.published_parsed:
+                    published = datetime(*entry.published_parsed[:6])
+                else:
+                    published = now
+
+                if published < time_threshold:
+                    continue
+
+                raw_summary = entry.summary if hasattr(entry, 'summary') else entry.title
+                raw_hash = content_hash(source["name"], entry.title, raw_summary)
+                if self.store.lookup(entry.link, raw_hash) is not None:
+                    known += 1
+                    continue
+
+                article = NewsArticle(
+                    source_name=source["name"],
+                    title=self._clean_text(entry.title),
+                    summary=self._clean_text(raw_summary),
+                    link=entry.link,
+                    published=published
+                )
+                self.store.upsert(article.link, raw_hash, article.model_dump(mode='json'),
+                                  published.timestamp())
+                new += 1
+            except:
+                pass
+        return new, known
+
+    @timed("rss.fetch_articles")
     def fetch_articles(self) -> List[NewsArticle]:
-        all_articles = []
+        """Unpublished articles from the last 7 days, newest first"""
         now = datetime.now()
         time_threshold = now - timedelta(days=7)
 
-        for source in self.sources:
-            try:
-                print(f"  → {source['name']}...")
-                feed = feedparser.parse(source["feed_url"])
-
-                count = 0
-                for entry in feed.entries:
-                    try:
-                        if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                            published = datetime(*entry.published_parsed[:6])
-                        else:
-                            published = now
-
-                        if published < time_threshold:
-                            continue
-
-                        article = NewsArticle(
-                            source_name=source["name"],
-                            title=self._clean_text(entry.title),
-                            summary=self._clean_text(entry.summary if hasattr(entry, 'summary') else entry.title),
-                            link=entry.link,
-                            published=published
-                        )
-                        all_articles.append(article)
-                        count += 1
-                    except:
-                        pass
-
-                print(f"    ✓ {count} articles")
-            except Exception as e:
-                print(f"    ❌ Failed: {e}")
+        removed = self.store.compact()
+        if removed:
+            print(f"  🧹 Dropped {removed} expired articles from the index")
 
-        unique_articles = {a.link: a for a in all_articles}
-        return sorted(list(unique_articles.values()), key=lambda x: x.published, reverse=True)
+        print(f"  → Fetching {len(self.sources)} feeds concurrently...")
+        with ThreadPoolExecutor(max_workers=max(1, min(len(self.sources), FEED_MAX_WORKERS))) as pool:
+            futures = {pool.submit(self._fetch_feed, source): source for source in self.sources}
+
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    status, feed, validators = future.result()
+                    if status == 304:
+                        print(f"    ⏭️ {source['name']}: not modified")
+                        continue
+
+                    new, known = self._parse_entries(source, feed, now, time_threshold)
+                    self.validators[source["feed_url"]] = validators
+                    print(f"    ✓ {source['name']}: {new} new, {known} already indexed")
+                except Exception as e:
+                    print(f"    ❌ {source['name']} failed: {e}")
+
+        self._save_validators()
+
+        recent = self.store.recent(time_threshold.timestamp())
+        articles = [NewsArticle(**data) for data, _ in recent]
+        published_links = {a.link for a, (_, already_published) in zip(articles, recent) if already_published}
+
+        # One representative per story; drop stories we already covered
+        stories = []
+        for cluster in self.clusterer.cluster(articles):
+            if any(articles[i].link in published_links for i in cluster):
+                continue
+            stories.append(self.clusterer.representative([articles[i] for i in cluster]))
+
+        unpublished = len(articles) - len(published_links)
+        if unpublished > len(stories):
+            print(f"  🧩 Collapsed {unpublished} articles into {len(stories)} stories")
+
+        return sorted(stories, key=lambda x: x.published, reverse=True)
+
+    def mark_published(self, articles: List[NewsArticle]):
+        self.store.mark_published(a.link for a in articles)
 
 # ================================================================
 # GEMINI CONTENT GENERATOR
 # ================================================================
 
+def retry_hint_seconds(error: Exception) -> Optional[float]:
+    """Server-suggested retry delay from a Gemini error, e.g. retryDelay: '12s'"""
+    match = re.search(r"retry(?:Delay|[ _-]?in|[ _-]?after)['\"]?\s*[:=]?\s*['\"]?(\d+(?:\.\d+)?)\s*s",
+                      str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
 class GeminiContentGenerator:
-    def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+    RETRYABLE_ERRORS = ("503", "429", "overloaded", "unavailable", "resource_exhausted", "rate limit")
+
+    # Identical requests in flight across instances share one API call
+    _inflight: Dict[str, Future] = {}
+    _inflight_lock = threading.Lock()
+
+    def __init__(self, api_key: str, cache_dir: str = LLM_CACHE_DIR, cache_ttl_hours: float = LLM_CACHE_TTL_HOURS):
+        self.api_key = api_key
+        self._client = None
         self.model_name = "gemini-pro"
+        self.temperature = 0.7
+        self.max_retries = 4
+        self.backoff_cap = 60.0  # also bounds server retry hints
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl_hours * 3600
+        os.makedirs(cache_dir, exist_ok=True)
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0, "saved_seconds": 0.0, "api_seconds": 0.0}
+
+    @property
+    def client(self):
+        """Gemini client, constructed on the first API call"""
+        if self._client is None:
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def _cache_key(self, prompt: str, system_instruction: str) -> str:
+        payload = json.dumps({
+            "model": self.model_name,
+            "prompt": prompt,
+            "system_instruction": system_instruction,
+            "temperature": self.temperature,
+            "schema": GeneratedContent.model_json_schema(),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[Dict]:
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - entry["created"] > self.cache_ttl:
+            os.remove(path)
+            return None
+        return entry
 
+    def _cache_put(self, key: str, text: str, latency: float):
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"created": time.time(), "latency": latency, "text": text}, f)
+        os.replace(tmp_path, path)
+
+    @timed("gemini.generate_content")
     def generate_content(self, articles: List[NewsArticle]) -> Optional[GeneratedContent]:
         if not articles:
             return None
@@ -191,41 +481,107 @@ class GeminiContentGenerator:
             f"4. 'post_text' - Telegram caption (200 chars max, emoji-friendly)\n"
         )
 
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                print(f"  → Using {self.model_name} (attempt {attempt + 1}/{max_retries})...")
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt,
-                    config={
-                        "system_instruction": system_instruction,
-                        "response_mime_type": "application/json",
-                        "response_schema": GeneratedContent,
-                        "temperature": 0.7
-                    }
-                )
+        key = self._cache_key(prompt, system_instruction)
+        try:
+            entry = self._cache_get(key)
+            if entry:
+                self.metrics["hits"] += 1
+                self.metrics["saved_seconds"] += entry["latency"]
+                print(f"  ✅ Content loaded from cache (saved {entry['latency']:.1f}s)")
+                return GeneratedContent(**json.loads(entry["text"]))
+
+            self.metrics["misses"] += 1
+            text = self._generate_coalesced(key, prompt, system_instruction)
+            if text:
+                return GeneratedContent(**json.loads(text))
+        except Exception as e:
+            print(f"  ❌ Error: {e}")
+        finally:
+            self.export_metrics()
 
-                json_data = json.loads(response.text)
-                content = GeneratedContent(**json_data)
+        print(f"  ❌ All retries failed, using fallback content")
+        return self._generate_fallback_content(articles)
+
+    def _generate_coalesced(self, key: str, prompt: str, system_instruction: str) -> Optional[str]:
+        """Run one API call per distinct request; concurrent duplicates wait for it"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            self.metrics["coalesced"] += 1
+            print(f"  ⏳ Identical request already in flight, waiting for it...")
+            return future.result()
+
+        try:
+            text = self._call_with_retries(prompt, system_instruction)
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _call_with_retries(self, prompt: str, system_instruction: str) -> Optional[str]:
+        for attempt in range(self.max_retries):
+            start = time.perf_counter()
+            try:
+                print(f"  → Using {self.model_name} (attempt {attempt + 1}/{self.max_retries})...")
+                with span("gemini.api_call", model=self.model_name, attempt=attempt + 1):
+                    response = self.client.models.generate_content(
+                        model=self.model_name,
+                        contents=prompt,
+                        config={
+                            "system_instruction": system_instruction,
+                            "response_mime_type": "application/json",
+                            "response_schema": GeneratedContent,
+                            "temperature": self.temperature
+                        }
+                    )
+                latency = time.perf_counter() - start
+                self.metrics["api_seconds"] += latency
+
+                GeneratedContent(**json.loads(response.text))  # validate before caching
+                self._cache_put(self._cache_key(prompt, system_instruction), response.text, latency)
                 print(f"  ✅ Content generated successfully")
-                return content
+                return response.text
 
             except Exception as e:
-                error_msg = str(e)
-                if "503" in error_msg or "overloaded" in error_msg.lower():
-                    print(f"  ⚠️ Attempt {attempt + 1} failed: API overloaded")
-                    if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 5
-                        print(f"  ⏳ Waiting {wait_time}s before retry...")
-                        time.sleep(wait_time)
-                        continue
-                else:
+                self.metrics["api_seconds"] += time.perf_counter() - start
+                error_msg = str(e).lower()
+                if not any(marker in error_msg for marker in self.RETRYABLE_ERRORS):
                     print(f"  ❌ Error: {e}")
-                    break
-
-        print(f"  ❌ All retries failed, using fallback content")
-        return self._generate_fallback_content(articles)
+                    return None
+
+                print(f"  ⚠️ Attempt {attempt + 1} failed: API overloaded or rate limited")
+                if attempt < self.max_retries - 1:
+                    wait_time = retry_hint_seconds(e)
+                    if wait_time is None:
+                        wait_time = backoff_delay(attempt, base=2.0, cap=self.backoff_cap)
+                    wait_time = min(wait_time, self.backoff_cap)
+                    print(f"  ⏳ Waiting {wait_time:.1f}s before retry...")
+                    time.sleep(wait_time)
+
+        return None
+
+    def export_metrics(self):
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        write_prometheus_textfile("gemini_cache", [
+            ("newsbot_llm_cache_hits_total", self.metrics["hits"], None, "LLM response cache hits", "counter"),
+            ("newsbot_llm_cache_misses_total", self.metrics["misses"], None, "LLM response cache misses", "counter"),
+            ("newsbot_llm_coalesced_total", self.metrics["coalesced"], None,
+             "Requests served by an identical in-flight call", "counter"),
+            ("newsbot_llm_cache_hit_ratio", self.metrics["hits"] / lookups if lookups else 0.0, None,
+             "Share of lookups served from cache", "gauge"),
+            ("newsbot_llm_saved_seconds_total", round(self.metrics["saved_seconds"], 3), None,
+             "API latency avoided by cache hits", "counter"),
+            ("newsbot_llm_api_seconds_total", round(self.metrics["api_seconds"], 3), None,
+             "Time spent waiting on the Gemini API", "counter"),
+        ])
 
     def _generate_fallback_content(self, articles: List[NewsArticle]) -> GeneratedContent:
         """Fallback content generator when API fails"""
@@ -255,80 +611,523 @@ class GeminiContentGenerator:
 # ================================================================
 
 class ElevenLabsAudioGenerator:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache_dir: str = TTS_CACHE_DIR, cache_max_bytes: int = TTS_CACHE_MAX_BYTES):
         self.api_key = api_key
         self.base_url = "https://api.elevenlabs.io/v1"
         self.voice_id = "21m00Tcm4TlvDq8ikWAM"
-
-    def generate_audio(self, script: str, output_path: str) -> bool:
+        self.model_id = "eleven_monolingual_v1"
+        self.voice_settings = {
+            "stability": 0.5,
+            "similarity_boost": 0.75
+        }
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _request_body(self, text: str) -> Dict:
+        return {
+            "text": text,
+            "model_id": self.model_id,
+            "voice_settings": self.voice_settings
+        }
+
+    def cache_path(self, body: Dict) -> str:
+        """Content-addressed cache location for a TTS request"""
+        key = hashlib.sha256(
+            json.dumps({"voice_id": self.voice_id, **body}, sort_keys=True).encode()
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def _synthesize(self, body: Dict) -> Optional[str]:
+        """Return the cached MP3 for body, streaming it from the API on a miss"""
+        path = self.cache_path(body)
+        if os.path.exists(path):
+            os.utime(path)  # mark as recently used
+            return path
+
+        url = f"{self.base_url}/text-to-speech/{self.voice_id}"
+        headers = {
+            "xi-api-key": self.api_key,
+            "Content-Type": "application/json"
+        }
+
+        with span("elevenlabs.synthesize", chars=len(body["text"])):
+            response = get_client().post(url, json=body, headers=headers, stream=True)
+            with response:
+                if response.status_code != 200:
+                    print(f"  ❌ Error {response.status_code}")
+                    return None
+
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            f.write(chunk)
+                except Exception as e:
+                    # A stream cut off mid-way must not leave a partial file in the cache dir
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    print(f"  ❌ Audio stream failed: {e}")
+                    return None
+        os.replace(tmp_path, path)
+        evict_lru(self.cache_dir, "*.mp3", self.cache_max_bytes)
+        return path
+
+    @staticmethod
+    def split_sentences(script: str, min_chars: int = 40) -> List[str]:
+        """Split a script into sentences, merging fragments shorter than min_chars"""
+        sentences = []
+        for sentence in re.split(r'(?<=[.!?])\s+', script.strip()):
+            if sentences and len(sentences[-1]) < min_chars:
+                sentences[-1] = f"{sentences[-1]} {sentence}"
+            elif sentence:
+                sentences.append(sentence)
+        return sentences
+
+    @timed("elevenlabs.generate_audio")
+    def generate_audio(self, script: str, output_path: str,
+                       on_segment: Optional[Callable[[int, str], None]] = None) -> bool:
+        """Synthesize script to output_path.
+
+        With TTS_SEGMENTED each sentence is synthesized (and cached) on its own,
+        up to TTS_CONCURRENCY at a time; on_segment(index, path) fires in order
+        as segments become available, and the MP3s are joined without re-encoding.
+        """
         if not self.api_key:
             return False
 
         try:
-            print(f"  → Generating audio...")
-
-            url = f"{self.base_url}/text-to-speech/{self.voice_id}"
-            headers = {
-                "xi-api-key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            data = {
-                "text": script,
-                "model_id": "eleven_monolingual_v1",
-                "voice_settings": {
-                    "stability": 0.5,
-                    "similarity_boost": 0.75
-                }
-            }
-
-            response = requests.post(url, json=data, headers=headers, timeout=30)
-
-            if response.status_code != 200:
-                print(f"  ❌ Error {response.status_code}")
+            sentences = self.split_sentences(script) if TTS_SEGMENTED else [script]
+            if len(sentences) <= 1:
+                return self._generate_single(script, output_path, on_segment)
+
+            print(f"  → Generating audio in {len(sentences)} segments ({TTS_CONCURRENCY} concurrent)...")
+            start = time.perf_counter()
+
+            bodies = []
+            for idx, sentence in enumerate(sentences):
+                body = self._request_body(sentence)
+                # Neighbouring text keeps intonation continuous across segments
+                if idx > 0:
+                    body["previous_text"] = sentences[idx - 1]
+                if idx < len(sentences) - 1:
+                    body["next_text"] = sentences[idx + 1]
+                bodies.append(body)
+
+            segment_paths = []
+            with ThreadPoolExecutor(max_workers=max(1, TTS_CONCURRENCY)) as pool:
+                futures = [pool.submit(self._synthesize, body) for body in bodies]
+                for idx, future in enumerate(futures):
+                    path = future.result()
+                    if not path:
+                        return False
+                    if idx == 0:
+                        print(f"  ⏱️ First audio segment after {time.perf_counter() - start:.1f}s")
+                    if on_segment:
+                        on_segment(idx, path)
+                    segment_paths.append(path)
+
+            if not self._concat_segments(segment_paths, output_path):
                 return False
 
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
-
-            print(f"  ✅ Audio ready")
+            print(f"  ✅ Audio ready ({time.perf_counter() - start:.1f}s)")
             return True
 
         except Exception as e:
             print(f"  ❌ Error: {e}")
             return False
 
+    def _generate_single(self, script: str, output_path: str,
+                         on_segment: Optional[Callable[[int, str], None]] = None) -> bool:
+        print(f"  → Generating audio...")
+
+        body = self._request_body(script)
+        cached = os.path.exists(self.cache_path(body))
+        path = self._synthesize(body)
+        if not path:
+            return False
+
+        if on_segment:
+            on_segment(0, path)
+        shutil.copyfile(path, output_path)
+        print(f"  ✅ Audio ready{' (cached)' if cached else ''}")
+        return True
+
+    def _concat_segments(self, segment_paths: List[str], output_path: str) -> bool:
+        """Join MP3 segments with the concat demuxer, copying the stream"""
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as list_file:
+            for path in segment_paths:
+                list_file.write(f"file '{os.path.abspath(path)}'\n")
+
+        try:
+            cmd = [
+                'ffmpeg', '-y',
+                '-f', 'concat', '-safe', '0',
+                '-i', list_file.name,
+                '-c', 'copy',
+                output_path
+            ]
+            with span("ffmpeg.concat_audio", segments=len(segment_paths)):
+                result = sp.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"  ❌ Audio concat error: {result.stderr[-200:]}")
+            return result.returncode == 0
+        finally:
+            os.remove(list_file.name)
+
 # ================================================================
 # 3D ANIMATED BACKGROUND GENERATOR
 # ================================================================
 
+def evict_lru(directory: str, pattern: str, max_bytes: int, max_entries: Optional[int] = None):
+    """Delete the least recently used files until the directory fits its limits"""
+    entries = []
+    for path in glob.glob(os.path.join(directory, pattern)):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    while entries and (total > max_bytes or (max_entries is not None and len(entries) > max_entries)):
+        _, size, path = entries.pop(0)
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+class BackgroundClipCache:
+    """Content-addressed store of pre-encoded background clips"""
+
+    def __init__(self, directory: str, max_bytes: int, max_entries: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, params: Dict) -> str:
+        payload = json.dumps(params, sort_keys=True).encode()
+        return hashlib.sha256(payload).hexdigest()
+
+    def path_for(self, params: Dict) -> str:
+        return os.path.join(self.directory, f"{self.key(params)}.mp4")
+
+    def get(self, params: Dict) -> Optional[str]:
+        path = self.path_for(params)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)  # mark as recently used
+        return path
+
+    def put(self, params: Dict, clip_path: str) -> str:
+        path = self.path_for(params)
+        os.replace(clip_path, path)
+        evict_lru(self.directory, "*.mp4", self.max_bytes, self.max_entries)
+        return path
+
+def pipe_frames_to_ffmpeg(cmd: List[str], frames: Iterable) -> Tuple[bool, str]:
+    """Write raw frames to the stdin of an ffmpeg command"""
+    with tempfile.TemporaryFile() as stderr:
+        proc = sp.Popen(cmd, stdin=sp.PIPE, stdout=sp.DEVNULL, stderr=stderr)
+        try:
+            for frame in frames:
+                proc.stdin.write(memoryview(frame).cast('B'))
+        except BrokenPipeError:
+            pass  # ffmpeg exited early, its stderr explains why
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = proc.wait()
+        stderr.seek(0)
+        return returncode == 0, stderr.read().decode(errors='replace')
+
+# Render pools start from a clean server process: the parent is multi-threaded
+# (pipeline stages, HTTP pools), and forking it can copy a lock some other
+# thread holds, deadlocking the child on first use
+RENDER_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if RENDER_MP_CONTEXT.get_start_method() == "forkserver":
+    # Imported once in the server instead of once per worker; OpenBLAS's
+    # pool (numpy) quiesces itself around fork with atfork handlers
+    RENDER_MP_CONTEXT.set_forkserver_preload(["numpy", "cv2"])
+
+_worker_bg_gen = None
+_worker_slots: List[shared_memory.SharedMemory] = []
+
+
+def _init_render_worker(slot_names: Tuple[str, ...] = ()):
+    """Attach the parent's frame slots and start the worker's span totals from zero"""
+    global _worker_slots
+    SPANS.take_totals()
+    # Pool workers share the parent's resource tracker, which unlinks the slots if the parent dies
+    _worker_slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+
+
+def _render_frame_range(width: int, height: int, fps: int, loop_frames: Optional[int],
+                        start: int, stop: int, slot: int) -> Dict:
+    """Worker entry point: render frames [start, stop) into a shared frame slot; returns span totals"""
+    global _worker_bg_gen
+    config = (width, height, fps, loop_frames)
+    if _worker_bg_gen is None or (_worker_bg_gen.width, _worker_bg_gen.height, _worker_bg_gen.fps,
+                                  _worker_bg_gen.loop_frames) != config:
+        _worker_bg_gen = AnimatedBackgroundGenerator(width, height, fps, loop_frames=loop_frames)
+    frames = np.ndarray((stop - start, height, width, 3), dtype=np.uint8, buffer=_worker_slots[slot].buf)
+    for offset, frame_idx in enumerate(range(start, stop)):
+        _worker_bg_gen.render_frame(frame_idx, out=frames[offset])
+    return SPANS.take_totals()
+
+
 class AnimatedBackgroundGenerator:
-    def __init__(self, width=1080, height=1920, fps=30):
+    VERSION = 3  # bump whenever the rendered output changes
+    NUM_PARTICLES = 50
+    GRID_COLS = 5
+    GRID_ROWS = 6
+    NUM_STREAMS = 8
+    CLIP_ENCODE_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '16', '-pix_fmt', 'yuv420p']
+
+    CHUNK_FRAMES = 2  # frames per worker task and shared-memory slot
+
+    def __init__(self, width=1080, height=1920, fps=30, workers=1, loop_frames: Optional[int] = None):
         self.width = width
         self.height = height
         self.fps = fps
+        self.workers = workers
+        self.loop_frames = loop_frames
+
+        # Per-frame rates of the particle orbit (degrees), network phase, stream
+        # scroll (px) and the two size pulses (radians). With loop_frames each
+        # is nudged to complete whole cycles in the loop so cached clips wrap
+        # without a seam; without it they are exactly the original rates.
+        self._particle_speed = self._loop_rate(2, 360)
+        self._phase_speed = self._loop_rate(2, 100)
+        self._stream_speed = self._loop_rate(3, height)
+        self._particle_pulse = self._loop_rate(0.1, 2 * math.pi)
+        self._node_pulse = self._loop_rate(0.05, 2 * math.pi)
+
+        self._build_static_layers()
+
+    def looping(self, loop_frames: int) -> "AnimatedBackgroundGenerator":
+        """Generator with the same settings whose frames repeat every loop_frames"""
+        return AnimatedBackgroundGenerator(self.width, self.height, self.fps, self.workers, loop_frames)
+
+    def _loop_rate(self, rate, cycle: float):
+        """Nearest rate that completes a whole number of cycles per loop"""
+        if not self.loop_frames:
+            return rate
+        cycles = max(1, round(rate * self.loop_frames / cycle))
+        return cycle * cycles / self.loop_frames
+
+    def _build_static_layers(self):
+        """Precompute everything that does not change between frames"""
+        # Base gradient: one row colour per y, broadcast across the width
+        rows = (10 + (np.arange(self.height) / self.height) * 50).astype(np.int64)
+        gradient = np.stack([rows, rows + 10, rows + 40], axis=1).astype(np.uint8)
+        self._gradient = np.ascontiguousarray(
+            np.broadcast_to(gradient[:, None, :], (self.height, self.width, 3))
+        )
 
-    def generate_3d_background_frames(self, num_frames: int, output_dir: str) -> List[str]:
-        """Generate 3D animated background frames"""
-        frames = []
+        # Particle orbit constants
+        particle_ids = np.arange(self.NUM_PARTICLES)
+        self._particle_ids = particle_ids.astype(np.float64)
+        self._particle_offsets = particle_ids * 7.2
+        self._particle_radii = 100 + particle_ids * 4
+
+        # Neural network topology: node grid and edges shorter than 300px
+        node_x = self.width // (self.GRID_COLS + 1)
+        node_y = self.height // (self.GRID_ROWS + 1)
+        self._nodes = [
+            ((col + 1) * node_x, (row + 1) * node_y)
+            for row in range(self.GRID_ROWS)
+            for col in range(self.GRID_COLS)
+        ]
+        edges = []
+        phase_offsets = []
+        for i, (x1, y1) in enumerate(self._nodes):
+            for j, (x2, y2) in enumerate(self._nodes[i+1:]):
+                if math.sqrt((x2-x1)**2 + (y2-y1)**2) < 300:
+                    edges.append(((x1, y1), (x2, y2)))
+                    phase_offsets.append(i + j)
+        self._edges = edges
+        self._edge_phase_offsets = np.array(phase_offsets, dtype=np.int64)
+
+        # Data stream columns and per-segment colours
+        self._stream_x = [
+            int(self.width * (stream_id + 1) / (self.NUM_STREAMS + 1))
+            for stream_id in range(self.NUM_STREAMS)
+        ]
+        self._stream_offsets = np.arange(self.NUM_STREAMS) * 240
+        self._segment_colors = []
+        for segment in range(5):
+            opacity = int(200 * (1 - segment / 5))
+            self._segment_colors.append((int(opacity * 0.2), int(opacity * 0.6), 200))
+
+    def render_frame(self, frame_idx: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Render a single RGB frame, into out if given"""
+        if self.loop_frames:
+            frame_idx %= self.loop_frames
+        if out is None:
+            frame = self._gradient.copy()
+        else:
+            frame = out
+            np.copyto(frame, self._gradient)
 
-        print(f"  → Generating {num_frames} 3D background frames...")
+        # Animated rotating 3D particles
+        self._draw_3d_particles(frame, frame_idx)
+
+        # Neural network connections
+        self._draw_neural_network(frame, frame_idx)
+
+        # Animated data streams
+        self._draw_data_streams(frame, frame_idx)
+
+        return frame
+
+    def iter_frames(self, num_frames: int) -> Iterator:
+        """Yield RGB frames in order, rendering in worker processes if configured"""
+        if self.workers > 1:
+            yield from self._iter_frames_parallel(num_frames)
+            return
 
         for frame_idx in range(num_frames):
-            frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            yield self.render_frame(frame_idx)
 
-            # Base gradient background
-            for y in range(self.height):
-                color_val = int(10 + (y / self.height) * 50)
-                frame[y, :] = [color_val, color_val + 10, color_val + 40]
+            if (frame_idx + 1) % 100 == 0:
+                print(f"    ✓ {frame_idx + 1}/{num_frames}")
 
-            # Animated rotating 3D particles
-            self._draw_3d_particles(frame, frame_idx)
+    def _iter_frames_parallel(self, num_frames: int) -> Iterator[np.ndarray]:
+        """Render frame ranges across processes and yield the frames in order.
+
+        Workers render into a ring of shared-memory slots, two per worker, so
+        only slot indices and span totals cross the result pipe and memory
+        stays bounded no matter how long the video is. A yielded frame is a
+        view into its slot and is only valid until the next one is requested.
+        """
+        ranges = iter([
+            (start, min(start + self.CHUNK_FRAMES, num_frames))
+            for start in range(0, num_frames, self.CHUNK_FRAMES)
+        ])
+        frame_shape = (self.height, self.width, 3)
+        slots = [
+            shared_memory.SharedMemory(create=True, size=self.CHUNK_FRAMES * math.prod(frame_shape))
+            for _ in range(self.workers * 2)
+        ]
 
-            # Neural network connections
-            self._draw_neural_network(frame, frame_idx)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=RENDER_MP_CONTEXT,
+                                     initializer=_init_render_worker,
+                                     initargs=(tuple(slot.name for slot in slots),)) as pool:
+                pending = deque()
+
+                def submit_next(slot: int):
+                    frame_range = next(ranges, None)
+                    if frame_range is not None:
+                        pending.append((frame_range, slot, pool.submit(
+                            _render_frame_range, self.width, self.height, self.fps, self.loop_frames,
+                            *frame_range, slot
+                        )))
+
+                for slot in range(len(slots)):
+                    submit_next(slot)
+
+                while pending:
+                    (start, stop), slot, future = pending.popleft()
+                    SPANS.merge(future.result())
+                    yield from np.ndarray((stop - start, *frame_shape), dtype=np.uint8, buffer=slots[slot].buf)
+                    submit_next(slot)
+
+                    if stop % 100 < self.CHUNK_FRAMES or stop == num_frames:
+                        print(f"    ✓ {stop}/{num_frames}")
+        finally:
+            for slot in slots:
+                try:
+                    slot.close()
+                except BufferError:
+                    pass  # the consumer still holds the last frame; the mapping goes when it does
+                slot.unlink()
+
+    def rawvideo_input_args(self) -> List[str]:
+        """ffmpeg input options for frames produced by iter_frames"""
+        return [
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f"{self.width}x{self.height}",
+            '-framerate', str(self.fps),
+            '-i', '-',
+        ]
 
-            # Animated data streams
-            self._draw_data_streams(frame, frame_idx)
+    def stream_video(self, num_frames: int, output_path: str, duration_sec: float,
+                     encode_args: Optional[List[str]] = None) -> bool:
+        """Render frames straight into ffmpeg without touching disk"""
+        print(f"  → Streaming {num_frames} 3D background frames into ffmpeg ({duration_sec}s)...")
+
+        if encode_args is None:
+            encode_args = ['-c:v', 'libx264', '-preset', 'fast', '-pix_fmt', 'yuv420p']
+
+        cmd = [
+            'ffmpeg', '-y',
+            *self.rawvideo_input_args(),
+            '-t', str(duration_sec),
+            *encode_args,
+            output_path
+        ]
+
+        with span("ffmpeg.background", frames=num_frames):
+            ok, stderr = pipe_frames_to_ffmpeg(cmd, self.iter_frames(num_frames))
+        if ok:
+            print(f"  ✅ Background video created")
+            return True
+        else:
+            print(f"  ❌ Error: {stderr[-200:]}")
+            return False
+
+    def clip_params(self, duration_sec: float) -> Dict:
+        """Render parameters identifying a clip of duration_sec that loops onto itself"""
+        return {
+            "version": self.VERSION,
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+            "frames": max(1, math.ceil(duration_sec * self.fps)),
+            "encode": self.CLIP_ENCODE_ARGS,
+        }
+
+    def get_or_render_clip(self, cache: BackgroundClipCache, duration_sec: float) -> Optional[Tuple[str, float]]:
+        """Return (path, duration) of a cached loopable clip, rendering it on a miss"""
+        params = self.clip_params(duration_sec)
+        clip_duration = params["frames"] / self.fps
+
+        cached = cache.get(params)
+        if cached:
+            print(f"  ✅ Background clip cache hit ({clip_duration:.0f}s)")
+            return cached, clip_duration
+
+        print(f"  → Background clip cache miss, rendering {clip_duration:.0f}s loop...")
+        tmp_path = os.path.join(cache.directory, f".tmp_{os.getpid()}.mp4")
+        looping = self.looping(params["frames"])
+        if not looping.stream_video(params["frames"], tmp_path, clip_duration, self.CLIP_ENCODE_ARGS):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        return cache.put(params, tmp_path), clip_duration
+
+    def generate_3d_background_frames(self, num_frames: int, output_dir: str) -> List[str]:
+        """Generate 3D animated background frames"""
+        frames = []
+
+        print(f"  → Generating {num_frames} 3D background frames...")
+
+        for frame_idx in range(num_frames):
+            frame = self.render_frame(frame_idx)
 
             # Save frame
             frame_path = f"{output_dir}/bg_frame_{frame_idx:04d}.png"
@@ -340,11 +1139,62 @@ class AnimatedBackgroundGenerator:
 
         return frames
 
+    @timed("render.draw_particles", emit=False)
     def _draw_3d_particles(self, frame, frame_idx):
         """Draw rotating 3D particles"""
-        num_particles = 50
+        angles = (frame_idx * self._particle_speed + self._particle_offsets) % 360
+        radians = np.radians(angles)
+        xs = np.trunc(self.width / 2 + self._particle_radii * np.cos(radians)).astype(np.int64)
+        ys = np.trunc(self.height / 3 + self._particle_radii * np.sin(radians) * 0.5).astype(np.int64)
+        sizes = np.trunc(3 + 2 * np.sin(frame_idx * self._particle_pulse + self._particle_ids)).astype(np.int64)
+        greens = np.trunc(150 + 100 * np.sin(angles * 0.01)).astype(np.int64)
+
+        visible = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        for i in np.flatnonzero(visible):
+            center = (int(xs[i]), int(ys[i]))
+            size = int(sizes[i])
+            cv2.circle(frame, center, size, (0, int(greens[i]), 255), -1)
+            cv2.circle(frame, center, size + 2, (0, 100, 200), 1)
+
+    @timed("render.draw_neural_network", emit=False)
+    def _draw_neural_network(self, frame, frame_idx):
+        """Draw animated neural network nodes and connections"""
+        phases = (frame_idx * self._phase_speed + self._edge_phase_offsets) % 100
+        opacities = np.trunc(150 * (1 + np.sin(phases * 0.1))).astype(np.int64)
+        reds = np.trunc(opacities * 0.3).astype(np.int64)
+        greens = np.trunc(opacities * 0.8).astype(np.int64)
+
+        for (p1, p2), red, green in zip(self._edges, reds.tolist(), greens.tolist()):
+            cv2.line(frame, p1, p2, (red, green, 255), 1)
+
+        size = int(4 + 2 * math.sin(frame_idx * self._node_pulse))
+        for node in self._nodes:
+            cv2.circle(frame, node, size, (0, 200, 255), -1)
+            cv2.circle(frame, node, size + 2, (0, 150, 200), 1)
+
+    @timed("render.draw_data_streams", emit=False)
+    def _draw_data_streams(self, frame, frame_idx):
+        """Draw animated data streams flowing across screen"""
+        y_offsets = ((frame_idx * self._stream_speed + self._stream_offsets) % self.height).astype(np.int64)
+        seg_ys = (y_offsets[:, None] + np.arange(5) * 50) % self.height
+        point_ys = (y_offsets[:, None] + np.arange(3) * 100) % self.height
+
+        for x, seg_row, point_row in zip(self._stream_x, seg_ys.tolist(), point_ys.tolist()):
+            for seg_y, color in zip(seg_row, self._segment_colors):
+                cv2.line(frame, (x, seg_y), (x, seg_y + 50), color, 2)
+
+            for point_y in point_row:
+                cv2.circle(frame, (x, point_y), 3, (100, 200, 255), -1)
+
+    def _render_frame_reference(self, frame_idx: int) -> np.ndarray:
+        """Original per-pixel loop renderer, kept as the benchmark baseline"""
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+
+        for y in range(self.height):
+            color_val = int(10 + (y / self.height) * 50)
+            frame[y, :] = [color_val, color_val + 10, color_val + 40]
 
-        for i in range(num_particles):
+        for i in range(self.NUM_PARTICLES):
             angle = (frame_idx * 2 + i * 7.2) % 360
             radius = 100 + i * 4
             x = int(self.width / 2 + radius * math.cos(math.radians(angle)))
@@ -357,24 +1207,15 @@ class AnimatedBackgroundGenerator:
                 cv2.circle(frame, (x, y), size, color, -1)
                 cv2.circle(frame, (x, y), size + 2, (0, 100, 200), 1)
 
-    def _draw_neural_network(self, frame, frame_idx):
-        """Draw animated neural network nodes and connections"""
-        num_nodes = 30
-        grid_cols = 5
-        grid_rows = 6
-
-        node_x = self.width // (grid_cols + 1)
-        node_y = self.height // (grid_rows + 1)
-
+        node_x = self.width // (self.GRID_COLS + 1)
+        node_y = self.height // (self.GRID_ROWS + 1)
         nodes = []
-        for row in range(grid_rows):
-            for col in range(grid_cols):
-                x = (col + 1) * node_x
-                y = (row + 1) * node_y
-                nodes.append((x, y, row, col))
-
-        for i, (x1, y1, r1, c1) in enumerate(nodes):
-            for j, (x2, y2, r2, c2) in enumerate(nodes[i+1:]):
+        for row in range(self.GRID_ROWS):
+            for col in range(self.GRID_COLS):
+                nodes.append(((col + 1) * node_x, (row + 1) * node_y))
+
+        for i, (x1, y1) in enumerate(nodes):
+            for j, (x2, y2) in enumerate(nodes[i+1:]):
                 distance = math.sqrt((x2-x1)**2 + (y2-y1)**2)
                 if distance < 300:
                     phase = (frame_idx * 2 + i + j) % 100
@@ -382,18 +1223,14 @@ class AnimatedBackgroundGenerator:
                     color = (int(opacity * 0.3), int(opacity * 0.8), 255)
                     cv2.line(frame, (x1, y1), (x2, y2), color, 1)
 
-        for x, y, _, _ in nodes:
+        for x, y in nodes:
             size = int(4 + 2 * math.sin(frame_idx * 0.05))
             cv2.circle(frame, (x, y), size, (0, 200, 255), -1)
             cv2.circle(frame, (x, y), size + 2, (0, 150, 200), 1)
 
-    def _draw_data_streams(self, frame, frame_idx):
-        """Draw animated data streams flowing across screen"""
-        num_streams = 8
-
-        for stream_id in range(num_streams):
+        for stream_id in range(self.NUM_STREAMS):
             y_offset = (frame_idx * 3 + stream_id * 240) % self.height
-            x = int(self.width * (stream_id + 1) / (num_streams + 1))
+            x = int(self.width * (stream_id + 1) / (self.NUM_STREAMS + 1))
 
             for segment in range(5):
                 seg_y = (y_offset + segment * 50) % self.height
@@ -405,6 +1242,8 @@ class AnimatedBackgroundGenerator:
                 point_y = (y_offset + point * 100) % self.height
                 cv2.circle(frame, (x, point_y), 3, (100, 200, 255), -1)
 
+        return frame
+
     def create_video_from_frames(self, frame_list: List[str], output_path: str, duration_sec: float):
         """Create video from frames"""
         print(f"  → Creating background video ({duration_sec}s)...")
@@ -419,7 +1258,8 @@ class AnimatedBackgroundGenerator:
             output_path
         ]
 
-        result = sp.run(cmd, capture_output=True, text=True)
+        with span("ffmpeg.frames_to_video", frames=len(frame_list)):
+            result = sp.run(cmd, capture_output=True, text=True)
         if result.returncode == 0:
             print(f"  ✅ Background video created")
             return True
@@ -436,9 +1276,33 @@ class Video3DAssembler:
         self.width = 1080
         self.height = 1920
         self.fps = 30
-        self.bg_gen = AnimatedBackgroundGenerator(self.width, self.height, self.fps)
+        self.bg_gen = AnimatedBackgroundGenerator(self.width, self.height, self.fps, RENDER_WORKERS)
+        self.clip_cache = None
+        if USE_BACKGROUND_CACHE:
+            self.clip_cache = BackgroundClipCache(
+                BACKGROUND_CACHE_DIR, BACKGROUND_CACHE_MAX_BYTES, BACKGROUND_CACHE_MAX_ENTRIES
+            )
+
+    def render_speculative_background(self, directory: str) -> Optional[Tuple[str, float]]:
+        """Render a maximum-length background before the audio duration is known.
+
+        Uses the looping clip cache when enabled, otherwise writes a plain clip to directory.
+        Returns (path, duration) for assemble_video to trim, or None on failure.
+        """
+        if self.clip_cache:
+            return self.bg_gen.get_or_render_clip(self.clip_cache, BACKGROUND_CACHE_SECONDS)
+
+        num_frames = math.ceil(BACKGROUND_CACHE_SECONDS * self.fps)
+        clip_duration = num_frames / self.fps
+        clip_path = os.path.join(directory, "background.mp4")
+        print(f"  → Speculatively rendering {clip_duration:.0f}s background...")
+        if not self.bg_gen.stream_video(num_frames, clip_path, clip_duration, self.bg_gen.CLIP_ENCODE_ARGS):
+            return None
+        return clip_path, clip_duration
 
-    def assemble_video(self, content, audio_path: str, output_name: str) -> Optional[str]:
+    def assemble_video(self, content, audio_path: str, output_name: str,
+                       background: Optional[Tuple[str, float]] = None) -> Optional[str]:
+        """Encode the final video; `background` is a pre-rendered (path, duration) loop to trim"""
         try:
             print(f"  → Assembling 3D video...")
 
@@ -450,26 +1314,18 @@ class Video3DAssembler:
             print(f"  Audio duration: {duration:.1f}s")
 
             num_bg_frames = int(duration * self.fps)
-            bg_frames = self.bg_gen.generate_3d_background_frames(num_bg_frames, OUTPUT_DIR)
-
-            bg_video = f"{OUTPUT_DIR}/bg_video.mp4"
-            if not self.bg_gen.create_video_from_frames(bg_frames, bg_video, duration):
-                print("  ❌ Failed to create background")
-                return None
-
             output_path = f"{OUTPUT_DIR}/{output_name}.mp4"
-            if not self._add_text_overlay(bg_video, content, audio_path, output_path, duration):
-                return None
 
-            print(f"  ✅ Video created: {output_path}")
-
-            for frame in bg_frames[:10]:
-                try:
-                    if os.path.exists(frame):
-                        os.remove(frame)
-                except:
-                    pass
+            start = time.perf_counter()
+            if SINGLE_PASS_ENCODE:
+                ok = self._encode_single_pass(content, audio_path, output_path, num_bg_frames, duration,
+                                              clip=background)
+            else:
+                ok = self._encode_two_pass(content, audio_path, output_path, num_bg_frames, duration)
+            if not ok:
+                return None
 
+            print(f"  ✅ Video created: {output_path} ({time.perf_counter() - start:.1f}s encode)")
             return output_path
 
         except Exception as e:
@@ -478,33 +1334,109 @@ class Video3DAssembler:
             traceback.print_exc()
             return None
 
+    def _encode_single_pass(self, content, audio_path: str, output_path: str,
+                            num_frames: int, duration: float,
+                            clip: Optional[Tuple[str, float]] = None) -> bool:
+        """Render, overlay text and mux audio in one ffmpeg invocation"""
+        frames = None
+        if clip is None and self.clip_cache:
+            # The clip loops onto itself, so -stream_loop covers longer videos
+            clip = self.bg_gen.get_or_render_clip(self.clip_cache, BACKGROUND_CACHE_SECONDS)
+
+        if clip:
+            clip_path, clip_duration = clip
+            video_input = ['-i', clip_path]
+            if duration > clip_duration:
+                video_input = ['-stream_loop', '-1', *video_input]
+            print(f"  → Trimming pre-rendered background to {duration:.1f}s in a single-pass encode...")
+        else:
+            video_input = self.bg_gen.rawvideo_input_args()
+            frames = self.bg_gen.iter_frames(num_frames)
+            print(f"  → Streaming {num_frames} frames into a single-pass encode...")
+
+        cmd = [
+            'ffmpeg', '-y',
+            *video_input,
+            '-i', audio_path,
+            '-filter_complex', self._build_overlay_filter(content, '0:v', 'v'),
+            '-map', '[v]', '-map', '1:a',
+            '-t', str(duration),
+            '-c:v', 'libx264', '-preset', 'fast',
+            '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '192k',
+            '-shortest',
+            output_path
+        ]
+
+        with span("ffmpeg.single_pass", streamed=frames is not None, seconds_of_video=round(duration, 2)):
+            if frames is not None:
+                ok, stderr = pipe_frames_to_ffmpeg(cmd, frames)
+            else:
+                result = sp.run(cmd, capture_output=True, text=True)
+                ok, stderr = result.returncode == 0, result.stderr
+        if not ok:
+            print(f"  ❌ Encode error: {stderr[-200:]}")
+        return ok
+
+    def _encode_two_pass(self, content, audio_path: str, output_path: str,
+                         num_frames: int, duration: float) -> bool:
+        """Encode the background first, then re-encode it with the overlay"""
+        bg_video = f"{OUTPUT_DIR}/bg_video.mp4"
+        bg_frames = []
+
+        if STREAM_FRAMES:
+            bg_ok = self.bg_gen.stream_video(num_frames, bg_video, duration)
+        else:
+            bg_frames = self.bg_gen.generate_3d_background_frames(num_frames, OUTPUT_DIR)
+            bg_ok = self.bg_gen.create_video_from_frames(bg_frames, bg_video, duration)
+
+        if not bg_ok:
+            print("  ❌ Failed to create background")
+            return False
+
+        ok = self._add_text_overlay(bg_video, content, audio_path, output_path, duration)
+
+        for frame in bg_frames:
+            try:
+                if os.path.exists(frame):
+                    os.remove(frame)
+            except:
+                pass
+
+        return ok
+
+    def _build_overlay_filter(self, content, input_label: str, output_label: str) -> str:
+        """drawtext filter chain for the headline and bullet points"""
+        headline = content.headline.replace("'", "")
+        bullets = "\n".join([f"• {b}" for b in content.bullet_points[:3]])
+        bullets = bullets.replace("'", "")
+
+        return (
+            f"[{input_label}]"
+            f"drawtext=text='{headline}':fontfile=/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf:"
+            f"fontsize=60:fontcolor=white:x=(w-text_w)/2:y=300:box=1:boxcolor=black@0.5,"
+            f"drawtext=text='{bullets}':fontfile=/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf:"
+            f"fontsize=40:fontcolor=white:x=100:y=800:box=1:boxcolor=black@0.3"
+            f"[{output_label}]"
+        )
+
     def _add_text_overlay(self, bg_video: str, content, audio_path: str, output_path: str, duration: float) -> bool:
         """Add text overlay to background video"""
         try:
-            headline = content.headline.replace("'", "")
-            bullets = "\n".join([f"• {b}" for b in content.bullet_points[:3]])
-            bullets = bullets.replace("'", "")
-
-            drawtext_filter = (
-                f"drawtext=text='{headline}':fontfile=/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf:"
-                f"fontsize=60:fontcolor=white:x=(w-text_w)/2:y=300:box=1:boxcolor=black@0.5,"
-                f"drawtext=text='{bullets}':fontfile=/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf:"
-                f"fontsize=40:fontcolor=white:x=100:y=800:box=1:boxcolor=black@0.3"
-            )
-
             cmd = [
                 'ffmpeg', '-y',
                 '-i', bg_video,
                 '-i', audio_path,
-                '-filter_complex', drawtext_filter,
+                '-filter_complex', self._build_overlay_filter(content, '0:v', 'v'),
                 '-c:v', 'libx264', '-preset', 'fast',
                 '-c:a', 'aac', '-b:a', '192k',
-                '-map', '0:v', '-map', '1:a',
+                '-map', '[v]', '-map', '1:a',
                 '-shortest',
                 output_path
             ]
 
-            result = sp.run(cmd, capture_output=True, text=True)
+            with span("ffmpeg.overlay"):
+                result = sp.run(cmd, capture_output=True, text=True)
             return result.returncode == 0
 
         except Exception as e:
@@ -519,7 +1451,8 @@ class Video3DAssembler:
                 '-of', 'default=noprint_wrappers=1:nokey=1:nokey=1',
                 audio_path
             ]
-            result = sp.run(cmd, capture_output=True, text=True, check=True)
+            with span("ffprobe.duration"):
+                result = sp.run(cmd, capture_output=True, text=True, check=True)
             return float(result.stdout.strip())
         except:
             return None
@@ -528,49 +1461,163 @@ class Video3DAssembler:
 # TELEGRAM PUBLISHER
 # ================================================================
 
-class TelegramPublisher:
-    def __init__(self, bot_token: str, channel_id: str):
-        self.bot_token = bot_token
-        self.channel_id = channel_id
-        self.api_url = f"https://api.telegram.org/bot{bot_token}"
+class StreamingMultipartBody:
+    """multipart/form-data body that reads the file part lazily.
 
-    def publish_video(self, video_path: str, caption: str) -> bool:
-        """Publish video to Telegram channel"""
-        if not os.path.exists(video_path):
-            print(f"  ❌ Video file not found: {video_path}")
-            return False
+    requests sends it in small blocks with a known Content-Length, so the
+    video is never held in memory; seek(0) lets a retry resend it.
+    """
+
+    def __init__(self, fields: Dict[str, str], file_field: str, file_path: str,
+                 content_type: str = 'application/octet-stream'):
+        self.boundary = f"----newsbot{os.urandom(12).hex()}"
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.file_path = file_path
 
+        preamble = b''.join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        )
+        preamble += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+            f'filename="{os.path.basename(file_path)}"\r\nContent-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self._preamble = preamble
+        self._epilogue = f'\r\n--{self.boundary}--\r\n'.encode()
+        self.len = len(preamble) + os.path.getsize(file_path) + len(self._epilogue)
+        self._file = None
+        self.seek(0)
+
+    def __len__(self):
+        return self.len
+
+    def seek(self, offset: int, whence: int = 0):
+        if offset != 0 or whence != 0:
+            raise ValueError("StreamingMultipartBody can only be rewound")
+        if self._file:
+            self._file.close()
+        self._file = open(self.file_path, 'rb')
+        self._parts = [io.BytesIO(self._preamble), self._file, io.BytesIO(self._epilogue)]
+        return 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class TelegramFileIdStore:
+    """Remembers the file_id Telegram assigned to each uploaded file"""
+
+    def __init__(self, path: str):
+        self.path = path
         try:
-            print(f"  → Publishing to Telegram...")
+            with open(path) as f:
+                self.file_ids = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.file_ids = {}
+
+    @staticmethod
+    def digest(file_path: str) -> str:
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def get(self, digest: str) -> Optional[str]:
+        return self.file_ids.get(digest)
+
+    def put(self, digest: str, file_id: str):
+        self.file_ids[digest] = file_id
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.file_ids, f, indent=2)
+        os.replace(tmp_path, self.path)
 
-            with open(video_path, 'rb') as video_file:
-                files = {'video': video_file}
-                data = {
-                    'chat_id': self.channel_id,
-                    'caption': caption,
-                    'parse_mode': 'HTML'
-                }
 
-                response = requests.post(
+class TelegramPublisher:
+    def __init__(self, bot_token: str, channel_ids, file_ids: Optional[TelegramFileIdStore] = None):
+        self.bot_token = bot_token
+        self.channel_ids = [channel_ids] if isinstance(channel_ids, str) else list(channel_ids)
+        self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        self.file_ids = file_ids or TelegramFileIdStore(TELEGRAM_FILE_IDS_PATH)
+
+    def _send_video(self, channel_id: str, video_path: str, caption: str, file_id: Optional[str]):
+        """One sendVideo call; uploads the file only when there is no file_id to reuse"""
+        data = {
+            'chat_id': channel_id,
+            'caption': caption,
+            'parse_mode': 'HTML'
+        }
+
+        with span("telegram.send_video", channel=channel_id, reused_file_id=bool(file_id)):
+            if file_id:
+                data['video'] = file_id
+                return get_client().post(f"{self.api_url}/sendVideo", data=data)
+
+            body = StreamingMultipartBody(data, 'video', video_path, 'video/mp4')
+            try:
+                return get_client().post(
                     f"{self.api_url}/sendVideo",
-                    files=files,
-                    data=data,
-                    timeout=120
+                    data=body,
+                    headers={'Content-Type': body.content_type}
                 )
+            finally:
+                body.close()
 
-            result = response.json()
+    def publish_video(self, video_path: str, caption: str, channel_ids: Optional[List[str]] = None,
+                      on_published: Optional[Callable[[str], None]] = None) -> Dict[str, bool]:
+        """Publish video to channel_ids (default: every configured channel); returns success per channel.
 
-            if response.status_code == 200 and result.get('ok'):
-                print(f"  ✅ Published to Telegram!")
-                return True
-            else:
-                error = result.get('description', 'Unknown error')
-                print(f"  ❌ Telegram error: {error}")
-                return False
+        on_published(channel_id) runs right after each successful send, so a
+        caller can record deliveries before a later channel fails or hangs.
+        """
+        channel_ids = self.channel_ids if channel_ids is None else channel_ids
+        if not os.path.exists(video_path):
+            print(f"  ❌ Video file not found: {video_path}")
+            return dict.fromkeys(channel_ids, False)
 
-        except Exception as e:
-            print(f"  ❌ Publish failed: {e}")
-            return False
+        digest = self.file_ids.digest(video_path)
+        results = dict.fromkeys(channel_ids, False)
+
+        for channel_id in channel_ids:
+            try:
+                file_id = self.file_ids.get(digest)
+                action = "Reusing uploaded video for" if file_id else "Uploading video to"
+                print(f"  → {action} {channel_id}...")
+
+                response = self._send_video(channel_id, video_path, caption, file_id)
+                result = response.json()
+
+                if response.status_code == 200 and result.get('ok'):
+                    message = result['result']
+                    media = message.get('video') or message.get('document') or message.get('animation')
+                    if media and not file_id:
+                        self.file_ids.put(digest, media['file_id'])
+                    print(f"  ✅ Published to {channel_id}!")
+                    results[channel_id] = True
+                    if on_published:
+                        on_published(channel_id)
+                else:
+                    error = result.get('description', 'Unknown error')
+                    print(f"  ❌ Telegram error for {channel_id}: {error}")
+
+            except Exception as e:
+                print(f"  ❌ Publish to {channel_id} failed: {e}")
+
+        return results
 
 # ================================================================
 # DAILY WORKFLOW
@@ -582,106 +1629,347 @@ class DailyTelegramNewsWorkflow:
         self.generator = GeminiContentGenerator(GEMINI_API_KEY)
         self.audio_gen = ElevenLabsAudioGenerator(ELEVENLABS_API_KEY)
         self.assembler = Video3DAssembler()
-        self.publisher = TelegramPublisher(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID)
+        self.publisher = TelegramPublisher(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_IDS)
+        self.pipeline = self._build_pipeline()
+        self.run_id = None
         self.last_run = None
 
-    def generate_and_publish(self):
+    def _build_pipeline(self) -> StagePipeline:
+        """fetch → generate → audio → render → publish, with the background clip warmed alongside"""
+        return StagePipeline([
+            Stage("fetch", self._stage_fetch),
+            Stage("generate", self._stage_generate, deps=("fetch",)),
+            Stage("audio", self._stage_audio, deps=("generate",),
+                  artifacts=lambda out: [out["audio_path"]]),
+            Stage("background", self._stage_background,
+                  artifacts=lambda out: [out["path"]] if out else []),
+            Stage("render", self._stage_render, deps=("generate", "audio", "background"),
+                  artifacts=lambda out: [out["video_path"]]),
+            # Not checkpointed: a re-run sends only to the channels its delivery record is missing
+            Stage("publish", self._stage_publish, deps=("fetch", "generate", "render"), checkpoint=False),
+        ], RUN_CHECKPOINT_DIR, max_workers=3)
+
+    def _stage_fetch(self) -> Dict:
+        print("STEP 1: Fetching AI news\n")
+        articles = self.aggregator.fetch_articles()
+        if not articles:
+            raise StageError("No articles found")
+
+        print(f"✅ Found {len(articles)} articles\n")
+        return {"articles": [a.model_dump(mode='json') for a in articles]}
+
+    def _stage_generate(self, fetch: Dict) -> Dict:
+        print("STEP 2: Generating content\n")
+        articles = [NewsArticle(**data) for data in fetch["articles"]]
+        content = self.generator.generate_content(articles[:5])
+        if not content:
+            raise StageError("Generation failed")
+
+        print(f"✅ Headline: {content.headline}\n")
+        return content.model_dump(mode='json')
+
+    def _stage_audio(self, generate: Dict) -> Dict:
+        if not ENABLE_AUDIO:
+            raise StageError("Audio disabled - skipping video")
+
+        print("STEP 3: Generating audio (60 seconds)\n")
+        audio_path = os.path.join(self.pipeline.run_dir(self.run_id), "news_audio.mp3")
+        if not self.audio_gen.generate_audio(generate["script"], audio_path):
+            raise StageError("Audio generation failed")
+        print()
+        return {"audio_path": audio_path}
+
+    def _stage_background(self) -> Optional[Dict]:
+        """Speculatively render a maximum-length background while the network-bound stages run"""
+        if not (SPECULATIVE_RENDER and SINGLE_PASS_ENCODE):
+            return None
+        try:
+            with profile_section("background"):
+                clip = self.assembler.render_speculative_background(self.pipeline.run_dir(self.run_id))
+        except Exception as e:
+            # Speculative work never fails the run; the render stage falls back to rendering itself
+            print(f"  ⚠️ Speculative background failed: {e}")
+            clip = None
+        return {"path": clip[0], "duration": clip[1]} if clip else None
+
+    def _stage_render(self, generate: Dict, audio: Dict, background: Optional[Dict]) -> Dict:
+        print("STEP 4: Assembling 3D animated video\n")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        with profile_section("render"):
+            video_path = self.assembler.assemble_video(
+                GeneratedContent(**generate),
+                audio["audio_path"],
+                f"news_{timestamp}",
+                background=(background["path"], background["duration"]) if background else None
+            )
+        print()
+        if not video_path:
+            raise StageError("No video created")
+        return {"video_path": video_path}
+
+    def _stage_publish(self, fetch: Dict, generate: Dict, render: Dict) -> Dict:
+        print("STEP 5: Publishing to Telegram\n")
+        record_path = os.path.join(self.pipeline.run_dir(self.run_id), "published_channels.json")
+        try:
+            with open(record_path) as f:
+                delivered = json.load(f)
+        except (FileNotFoundError, ValueError):
+            delivered = {}
+
+        def record(channel_id: str):
+            delivered[channel_id] = datetime.now().isoformat()
+            tmp_path = f"{record_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(delivered, f)
+            os.replace(tmp_path, record_path)
+
+        pending = [c for c in self.publisher.channel_ids if c not in delivered]
+        if pending:
+            caption = f"<b>{generate['headline']}</b>\n\n{generate['post_text']}\n\n{HASHTAGS}"
+            self.publisher.publish_video(render["video_path"], caption, pending, on_published=record)
+        else:
+            print("  ♻️ Already published to every channel")
+
+        failed = [c for c in self.publisher.channel_ids if c not in delivered]
+        if not delivered:
+            raise StageError("Failed to publish")
+        if failed:
+            print(f"  ⚠️ Not published to {', '.join(failed)}; re-running {self.run_id} retries only those")
+
+        print()
+        self.aggregator.mark_published([NewsArticle(**data) for data in fetch["articles"][:3]])
+        return {"published_at": max(delivered.values()), "channels": delivered, "failed": failed}
+
+    def _print_overlap(self):
+        """Network-bound vs render time for the stages that ran this attempt"""
+        timings = self.pipeline.timings
+        network = sum(timings.get(name, 0.0) for name in ("fetch", "generate", "audio"))
+        render = timings.get("background", 0.0)
+        if not (network and render):
+            return
+        critical = max(network, render) + timings.get("render", 0.0)
+        print(f"  ⏱️ Network {network:.1f}s | background render {render:.1f}s | "
+              f"final encode {timings.get('render', 0.0):.1f}s | wall {self.pipeline.wall_time:.1f}s "
+              f"(sequential {network + render + timings.get('render', 0.0):.1f}s, "
+              f"overlapped bound {critical:.1f}s)")
+
+    def generate_and_publish(self, run_id: Optional[str] = None):
+        """Run today's pipeline, resuming from its first incomplete stage"""
+        self.run_id = run_id or datetime.now().strftime('%Y-%m-%d')
         print("\n" + "=" * 60)
-        print(f"🚀 DAILY AI NEWS - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"🚀 DAILY AI NEWS - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} (run {self.run_id})")
         print("=" * 60 + "\n")
+        span_snapshot = SPANS.totals()
 
         try:
-            print("STEP 1: Fetching AI news\n")
-            articles = self.aggregator.fetch_articles()
-            if not articles:
-                print("❌ No articles found\n")
-                return
-
-            print(f"✅ Found {len(articles)} articles\n")
-
-            print("STEP 2: Generating content\n")
-            content = self.generator.generate_content(articles[:5])
-            if not content:
-                print("❌ Generation failed\n")
-                return
-
-            print(f"✅ Headline: {content.headline}\n")
-
-            audio_path = None
-            if ENABLE_AUDIO:
-                print("STEP 3: Generating audio (60 seconds)\n")
-                audio_path = f"{OUTPUT_DIR}/news_audio.mp3"
-                if self.audio_gen.generate_audio(content.script, audio_path):
-                    print()
-                else:
-                    print("⚠️ Audio generation failed\n")
-                    return
-            else:
-                print("STEP 3: Audio disabled - skipping video\n")
-                return
-
-            video_path = None
-            if audio_path:
-                print("STEP 4: Assembling 3D animated video\n")
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                video_path = self.assembler.assemble_video(
-                    content,
-                    audio_path,
-                    f"news_{timestamp}"
-                )
-                print()
-            else:
-                print("STEP 4: Skipped (no audio)\n")
-                return
-
-            if video_path:
-                print("STEP 5: Publishing to Telegram\n")
-                caption = f"<b>{content.headline}</b>\n\n{content.post_text}\n\n{HASHTAGS}"
-
-                if self.publisher.publish_video(video_path, caption):
-                    print()
-                    self.last_run = datetime.now()
-                    print("=" * 60)
-                    print("✅ SUCCESS - Video published to Telegram!")
-                    print("=" * 60)
-                else:
-                    print("❌ Failed to publish\n")
+            removed = self.pipeline.prune(RUN_CHECKPOINT_DAYS)
+            if removed:
+                print(f"  🧹 Removed {removed} old run checkpoints")
+
+            outputs = self.pipeline.run(self.run_id)
+            self._print_overlap()
+            if "publish" in outputs:
+                self.last_run = datetime.now()
+                print("=" * 60)
+                print("✅ SUCCESS - Video published to Telegram!")
+                print("=" * 60)
             else:
-                print("❌ No video created\n")
+                print(f"\n❌ Run {self.run_id} incomplete - the next attempt resumes from its checkpoints\n")
 
         except Exception as e:
             print(f"❌ Workflow error: {e}")
             import traceback
             traceback.print_exc()
 
-    def schedule_daily(self):
-        """Schedule daily publication"""
-        schedule.every().day.at(PUBLISH_TIME).do(self.generate_and_publish)
-        print(f"⏰ Scheduled to publish daily at {PUBLISH_TIME}")
+        finally:
+            get_client().print_stats()
+            SPANS.print_summary(since=span_snapshot)
+            try:
+                SPANS.export_prometheus("video_spans")
+            except OSError as e:
+                print(f"  ⚠️ Span export failed: {e}")
+
+    @staticmethod
+    def run_id_for(slot: datetime) -> str:
+        """Run id of a publish slot: its date, plus the time when there are several slots a day"""
+        return slot.strftime('%Y-%m-%d' if len(PUBLISH_TIMES) == 1 else '%Y-%m-%d_%H%M')
 
     def run_scheduler(self):
         """Run the scheduler"""
         print("\n🤖 Starting Daily Telegram AI News Bot...\n")
-        self.schedule_daily()
+        overlap = SCHEDULER_OVERLAP
+        if overlap == "concurrent":
+            # Stages read the current run id from the workflow, so runs must not interleave
+            print("⚠️ Concurrent runs are not supported by the video workflow; queueing instead")
+            overlap = "queue"
+
+        scheduler = AsyncScheduler(SCHEDULER_STATE_PATH, metrics_name="video_scheduler")
+        scheduler.add_job(DailyJob(
+            "video_news",
+            lambda slot: self.generate_and_publish(self.run_id_for(slot)),
+            PUBLISH_TIMES,
+            overlap=overlap,
+            jitter_seconds=SCHEDULER_JITTER_SECONDS,
+            catch_up_seconds=SCHEDULER_CATCH_UP_HOURS * 3600,
+        ))
+        scheduler.run_forever()
 
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+# ================================================================
+# BENCHMARKS
+# ================================================================
+
+def benchmark_background_renderer(num_frames: int = 60):
+    """Compare the reference loop renderer with the vectorized one"""
+    print(f"\n⏱️ Background renderer benchmark ({num_frames} frames)\n")
+    bg_gen = AnimatedBackgroundGenerator(*VIDEO_DIMENSIONS, FPS)
+
+    start = time.perf_counter()
+    reference = [bg_gen._render_frame_reference(i) for i in range(num_frames)]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = [bg_gen.render_frame(i) for i in range(num_frames)]
+    vectorized_time = time.perf_counter() - start
+
+    mismatches = sum(
+        1 for a, b in zip(reference, vectorized) if not np.array_equal(a, b)
+    )
+
+    print(f"  Reference:  {num_frames / reference_time:8.1f} fps")
+    print(f"  Vectorized: {num_frames / vectorized_time:8.1f} fps")
+    print(f"  Speed-up:   {reference_time / vectorized_time:8.1f}x")
+    if mismatches:
+        print(f"  ❌ {mismatches}/{num_frames} frames differ")
+    else:
+        print(f"  ✅ Output is pixel-identical")
+
+    # Only cached clips loop; their rates are nudged to whole cycles per loop
+    period = bg_gen.clip_params(BACKGROUND_CACHE_SECONDS)["frames"]
+    looping = bg_gen.looping(period)
+    seamless = np.array_equal(looping.render_frame(0), looping.render_frame(period))
+    print(f"  {'✅' if seamless else '❌'} Cached clip frame 0 {'matches' if seamless else 'differs from'} "
+          f"frame {period} (loop period {period / bg_gen.fps:.0f}s)")
+    print(f"     Loop rates vs original: streams {looping._stream_speed:.3f} vs 3 px/frame, "
+          f"pulses {looping._particle_pulse:.4f}/{looping._node_pulse:.4f} vs 0.1/0.05 rad/frame")
+    return mismatches == 0 and seamless
+
+def benchmark_video_encode(duration_sec: float = 10.0) -> bool:
+    """Compare the two-pass and single-pass video encodes; returns True if both succeeded"""
+    print(f"\n⏱️ Video encode benchmark ({duration_sec}s clip)\n")
+    assembler = Video3DAssembler()
+    content = GeneratedContent(
+        headline="AI News Roundup Today",
+        bullet_points=["Benchmark point one", "Benchmark point two", "Benchmark point three"],
+        script="",
+        post_text="",
+    )
+    num_frames = int(duration_sec * assembler.fps)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = os.path.join(tmp, "silence.m4a")
+        try:
+            sp.run([
+                'ffmpeg', '-y', '-f', 'lavfi', '-i', 'anullsrc=r=44100:cl=mono',
+                '-t', str(duration_sec), '-c:a', 'aac', audio_path
+            ], capture_output=True, check=True)
+        except (OSError, sp.CalledProcessError) as e:
+            print(f"  ❌ Could not generate the test audio track: {e}")
+            return False
+
+        timings = {}
+        results = {}
+        for name, encode in (("two-pass", assembler._encode_two_pass),
+                             ("single-pass", assembler._encode_single_pass)):
+            start = time.perf_counter()
+            ok = encode(content, audio_path, os.path.join(tmp, f"{name}.mp4"), num_frames, duration_sec)
+            timings[name] = time.perf_counter() - start
+            results[name] = ok
+            print(f"  {name:12s} {timings[name]:6.1f}s {'✅' if ok else '❌'}")
+
+    if not all(results.values()):
+        failed = ", ".join(name for name, ok in results.items() if not ok)
+        print(f"  ❌ No comparison: {failed} encode failed")
+        return False
+
+    saved = timings["two-pass"] - timings["single-pass"]
+    print(f"  Saved {saved:.1f}s per {duration_sec}s video "
+          f"({saved / timings['two-pass'] * 100:.0f}%)")
+    return True
+
+def benchmark_parallel_render(num_frames: int = 240, max_workers: Optional[int] = None):
+    """Measure render throughput as the worker count grows"""
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"\n⏱️ Parallel render scaling benchmark ({num_frames} frames, up to {max_workers} workers)\n")
+
+    worker_counts = sorted({1, max_workers} | {2 ** n for n in range(1, max_workers.bit_length()) if 2 ** n < max_workers})
+    baseline = None
+    for workers in worker_counts:
+        bg_gen = AnimatedBackgroundGenerator(*VIDEO_DIMENSIONS, FPS, workers)
+        start = time.perf_counter()
+        for _ in bg_gen.iter_frames(num_frames):
+            pass
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  {workers:3d} workers: {num_frames / elapsed:8.1f} fps  ({baseline / elapsed:4.1f}x)")
 
 # ================================================================
 # ENTRY POINT
 # ================================================================
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Daily Telegram AI news publisher")
+    parser.add_argument("--benchmark-render", type=int, metavar="FRAMES",
+                        help="benchmark the background renderer and exit")
+    parser.add_argument("--benchmark-encode", type=float, metavar="SECONDS",
+                        help="benchmark two-pass vs single-pass encoding and exit")
+    parser.add_argument("--benchmark-workers", type=int, metavar="FRAMES",
+                        help="benchmark render scaling across worker counts and exit")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS,
+                        help="background render processes (default: $RENDER_WORKERS or 1)")
+    parser.add_argument("--check-deps", action="store_true",
+                        help="check packages and ffmpeg, then exit")
+    parser.add_argument("--profile", choices=("cprofile", "sample"),
+                        help="profile the render path and write pstats or folded stacks to $PROFILE_DIR")
+    parser.add_argument("--run-once", nargs="?", const="", metavar="RUN_ID",
+                        help="run (or resume) one pipeline now and exit; RUN_ID defaults to today")
+    args = parser.parse_args()
+    RENDER_WORKERS = max(1, args.workers)
+    if args.profile:
+        set_profile_mode(args.profile)
+        if RENDER_WORKERS > 1:
+            print("⚠️ Profiles cover the main process only; use --workers 1 to profile frame rendering")
+
+    deps_ok = check_dependencies()
+    if args.check_deps:
+        sys.exit(0 if deps_ok else 1)
+
+    if args.benchmark_workers:
+        benchmark_parallel_render(args.benchmark_workers, args.workers if args.workers > 1 else None)
+        sys.exit(0)
+
+    if args.benchmark_encode:
+        sys.exit(0 if benchmark_video_encode(args.benchmark_encode) else 1)
+
+    if args.benchmark_render:
+        with profile_section("benchmark_render"):
+            ok = benchmark_background_renderer(args.benchmark_render)
+        sys.exit(0 if ok else 1)
+
     workflow = DailyTelegramNewsWorkflow()
 
+    if args.run_once is not None:
+        workflow.generate_and_publish(args.run_once or None)
+        sys.exit(0 if workflow.last_run else 1)
+
     print("\n" + "=" * 60)
     print("DAILY TELEGRAM AI NEWS PUBLISHER - 3D VERSION")
     print("=" * 60)
 
     print("\n📋 Configuration:")
     print(f"  Channel ID: {TELEGRAM_CHANNEL_ID}")
-    print(f"  Publish time: {PUBLISH_TIME}")
+    print(f"  Publish times: {', '.join(PUBLISH_TIMES)}")
     print(f"  Audio enabled: {ENABLE_AUDIO}")
     print(f"  Video duration: ~60 seconds")
     print(f"  3D backgrounds: ✅ Enabled")
@@ -0,0 +1,139 @@
+# ================================================================
+# PERSISTENT ARTICLE STORE
+# SQLite index of processed articles shared by both news pipelines
+# ================================================================
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'cmpid', 'ncid'}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of an article URL used as the store key"""
+    parts = urlsplit(url.strip())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS
+    ]
+    path = parts.path.rstrip('/') or '/'
+    netloc = parts.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    return urlunsplit(('https' if parts.scheme in ('http', 'https') else parts.scheme,
+                       netloc, path, urlencode(sorted(query)), ''))
+
+
+def content_hash(*parts: str) -> str:
+    """Stable hash of the raw article content"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update((part or '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ArticleStore:
+    """Remembers which articles were processed and which were published.
+
+    Entries not seen for ttl_days are dropped by compact(), which keeps the
+    database bounded to roughly the feeds' rolling window.
+    """
+
+    def __init__(self, path: str, ttl_days: int = 30):
+        self.path = path
+        self.ttl_days = ttl_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                data TEXT NOT NULL,
+                published REAL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                published_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published)")
+        self._conn.commit()
+
+    def lookup(self, url: str, raw_hash: str) -> Optional[Dict]:
+        """Cached processed data for url if its content is unchanged"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, data FROM articles WHERE url_key = ?",
+                (normalize_url(url),)
+            ).fetchone()
+            if not row or row[0] != raw_hash:
+                return None
+            self._conn.execute(
+                "UPDATE articles SET last_seen = ? WHERE url_key = ?",
+                (time.time(), normalize_url(url))
+            )
+            self._conn.commit()
+        return json.loads(row[1])
+
+    def upsert(self, url: str, raw_hash: str, data: Dict, published: Optional[float] = None):
+        """Insert or refresh an article, keeping its publish state"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO articles (url_key, content_hash, data, published, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url_key) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    data = excluded.data,
+                    published = excluded.published,
+                    last_seen = excluded.last_seen
+            """, (normalize_url(url), raw_hash, json.dumps(data, default=str), published, now, now))
+            self._conn.commit()
+
+    def is_published(self, url: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT published_at FROM articles WHERE url_key = ?",
+                (normalize_url(url),)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def mark_published(self, urls: Iterable[str]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE articles SET published_at = ? WHERE url_key = ?",
+                [(now, normalize_url(url)) for url in urls]
+            )
+            self._conn.commit()
+
+    def recent(self, since: float) -> List[Tuple[Dict, bool]]:
+        """(data, already_published) for articles published after since, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data, published_at FROM articles WHERE published >= ? ORDER BY published DESC",
+                (since,)
+            ).fetchall()
+        return [(json.loads(data), bool(published_at)) for data, published_at in rows]
+
+    def compact(self) -> int:
+        """Drop entries older than the TTL; returns the number removed"""
+        cutoff = time.time() - self.ttl_days * 86400
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM articles WHERE last_seen < ?", (cutoff,)
+            ).rowcount
+            self._conn.commit()
+            if removed:
+                self._conn.execute("VACUUM")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,246 @@
+# ================================================================
+# ASYNC SCHEDULER
+# Daily publish slots on an asyncio event loop, shared by both pipelines
+# ================================================================
+
+import asyncio
+import json
+import os
+import random
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from instrumentation import METRICS_DIR, write_prometheus_textfile
+
+OVERLAP_POLICIES = ("skip", "queue", "concurrent")
+
+# Longest single sleep; wakeups re-read the wall clock so suspends and clock
+# adjustments cannot push a slot back by more than this
+MAX_SLEEP_SECONDS = 60.0
+
+
+def parse_times(spec: str) -> List[str]:
+    """'09:00, 18:30' -> ['09:00', '18:30'], validated and sorted"""
+    times = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        hour, minute = map(int, part.split(':'))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"invalid publish time {part!r}")
+        times.append(f"{hour:02d}:{minute:02d}")
+    if not times:
+        raise ValueError("no publish times given")
+    return sorted(set(times))
+
+
+class DailyJob:
+    """A job that runs at fixed local times every day.
+
+    `func(slot)` is called in a worker thread with the scheduled slot time,
+    so slow runs never block the event loop. `overlap` decides what happens
+    when a slot fires while the previous run is still going: "skip" drops
+    the new slot, "queue" runs it after the previous one finishes, and
+    "concurrent" starts it immediately. Each slot fires at a random offset
+    in [0, jitter_seconds). On startup, the most recent missed slot runs
+    once if it is less than catch_up_seconds old (0 disables catch-up).
+    """
+
+    def __init__(self, name: str, func: Callable[[datetime], None], times: List[str],
+                 overlap: str = "skip", jitter_seconds: float = 0.0, catch_up_seconds: float = 0.0):
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"overlap must be one of {OVERLAP_POLICIES}, got {overlap!r}")
+        self.name = name
+        self.func = func
+        self.times = [tuple(map(int, t.split(':'))) for t in parse_times(','.join(times))]
+        self.overlap = overlap
+        self.jitter_seconds = max(0.0, jitter_seconds)
+        self.catch_up_seconds = max(0.0, catch_up_seconds)
+
+        self.active = 0
+        self.lock: Optional[asyncio.Lock] = None
+        self.stats = {'runs': 0, 'failures': 0, 'skipped': 0, 'catch_ups': 0,
+                      'last_lag': 0.0, 'last_slot_lag': 0.0, 'last_jitter': 0.0,
+                      'last_duration': 0.0, 'last_start': 0.0}
+
+    def _slots_around(self, now: datetime):
+        for day in (now.date() - timedelta(days=1), now.date(), now.date() + timedelta(days=1)):
+            for hour, minute in self.times:
+                yield datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+
+    def next_slot(self, now: datetime) -> datetime:
+        return min(slot for slot in self._slots_around(now) if slot > now)
+
+    def previous_slot(self, now: datetime) -> datetime:
+        return max(slot for slot in self._slots_around(now) if slot <= now)
+
+
+class AsyncScheduler:
+    """Fires DailyJobs from one event loop with wall-clock wakeups.
+
+    The last slot started per job is persisted to state_path for catch-up
+    after restarts. Start lag against both the jittered fire time and the
+    scheduled slot, the jitter itself, run durations and outcomes are
+    exported as a Prometheus textfile.
+    """
+
+    def __init__(self, state_path: str, metrics_name: str = "scheduler", metrics_dir: str = METRICS_DIR):
+        self.state_path = state_path
+        self.metrics_name = metrics_name
+        self.metrics_dir = metrics_dir
+        self.jobs: Dict[str, DailyJob] = {}
+        self._tasks = set()
+        self.state = self._load_state()
+
+    def add_job(self, job: DailyJob) -> DailyJob:
+        self.jobs[job.name] = job
+        return job
+
+    def _load_state(self) -> Dict[str, Dict]:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def export_metrics(self):
+        samples = []
+        for name, job in self.jobs.items():
+            labels = {'job': name}
+            samples += [
+                ("news_scheduler_start_lag_seconds", round(job.stats['last_lag'], 3), labels,
+                 "Actual start minus scheduled (jittered) start of the last run", "gauge"),
+                ("news_scheduler_slot_lag_seconds", round(job.stats['last_slot_lag'], 3), labels,
+                 "Actual start minus the scheduled slot time of the last run, jitter included", "gauge"),
+                ("news_scheduler_jitter_seconds", round(job.stats['last_jitter'], 3), labels,
+                 "Random offset added to the last run's slot time", "gauge"),
+                ("news_scheduler_last_duration_seconds", round(job.stats['last_duration'], 3), labels,
+                 "Duration of the last completed run", "gauge"),
+                ("news_scheduler_last_start_timestamp_seconds", round(job.stats['last_start'], 3), labels,
+                 "Unix time the last run started", "gauge"),
+                ("news_scheduler_runs_total", job.stats['runs'], labels,
+                 "Runs started since the scheduler started", "counter"),
+                ("news_scheduler_failures_total", job.stats['failures'], labels,
+                 "Runs that raised since the scheduler started", "counter"),
+                ("news_scheduler_skipped_total", job.stats['skipped'], labels,
+                 "Slots dropped because the previous run was still going", "counter"),
+                ("news_scheduler_catch_ups_total", job.stats['catch_ups'], labels,
+                 "Missed slots run on startup", "counter"),
+            ]
+        try:
+            write_prometheus_textfile(self.metrics_name, samples, self.metrics_dir)
+        except OSError as e:
+            print(f"  ⚠️ Scheduler metrics export failed: {e}")
+
+    @staticmethod
+    async def _sleep_until(timestamp: float):
+        while True:
+            remaining = timestamp - time.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, MAX_SLEEP_SECONDS))
+
+    async def _execute(self, job: DailyJob, slot: datetime, fire_at: float, catch_up: bool = False):
+        if job.overlap == "queue":
+            await job.lock.acquire()
+        try:
+            start = time.time()
+            lag = start - fire_at
+            slot_lag = start - slot.timestamp()
+            job.active += 1
+            job.stats.update(runs=job.stats['runs'] + 1, last_lag=lag, last_slot_lag=slot_lag,
+                             last_jitter=fire_at - slot.timestamp(), last_start=start)
+            if catch_up:
+                job.stats['catch_ups'] += 1
+            self.state[job.name] = {'last_slot': slot.isoformat(), 'last_start': start}
+            self._save_state()
+            self.export_metrics()
+
+            kind = "catch-up run" if catch_up else "run"
+            print(f"\n⏰ {job.name}: {kind} for {slot:%Y-%m-%d %H:%M} "
+                  f"(start lag {lag:.2f}s, {slot_lag:.2f}s after the slot)")
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, job.func, slot)
+            except Exception as e:
+                job.stats['failures'] += 1
+                print(f"❌ {job.name} failed: {e}")
+                traceback.print_exc()
+            finally:
+                job.active -= 1
+                job.stats['last_duration'] = time.time() - start
+                self.export_metrics()
+        finally:
+            if job.overlap == "queue":
+                job.lock.release()
+
+    def _fire(self, job: DailyJob, slot: datetime, fire_at: float, catch_up: bool = False):
+        if job.overlap == "skip" and job.active:
+            job.stats['skipped'] += 1
+            print(f"⏭️ {job.name}: skipping {slot:%Y-%m-%d %H:%M}, previous run still in progress")
+            self.export_metrics()
+            return
+        task = asyncio.create_task(self._execute(job, slot, fire_at, catch_up))
+        # The loop keeps only weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _missed_slot(self, job: DailyJob) -> Optional[datetime]:
+        if not job.catch_up_seconds or job.name not in self.state:
+            return None
+        now = datetime.now()
+        slot = job.previous_slot(now)
+        last_slot = datetime.fromisoformat(self.state[job.name]['last_slot'])
+        if last_slot < slot and (now - slot).total_seconds() <= job.catch_up_seconds:
+            return slot
+        return None
+
+    async def _run_job(self, job: DailyJob):
+        job.lock = asyncio.Lock()
+        missed = self._missed_slot(job)
+        if missed:
+            self._fire(job, missed, missed.timestamp(), catch_up=True)
+
+        last_slot = missed or datetime.now()
+        while True:
+            # Never fire a slot twice, even if jitter or a clock step lands us before it again
+            slot = job.next_slot(max(datetime.now(), last_slot))
+            fire_at = slot.timestamp() + random.uniform(0, job.jitter_seconds)
+            await self._sleep_until(fire_at)
+            self._fire(job, slot, fire_at)
+            last_slot = slot
+
+    def run_once(self, name: str):
+        """Run a job now in place of its most recent slot, recorded so catch-up will not repeat it"""
+        job = self.jobs[name]
+        slot = job.previous_slot(datetime.now())
+
+        async def run():
+            job.lock = asyncio.Lock()
+            await self._execute(job, slot, slot.timestamp())
+
+        asyncio.run(run())
+        return job.stats['failures'] == 0
+
+    async def run(self):
+        self.export_metrics()
+        await asyncio.gather(*(self._run_job(job) for job in self.jobs.values()))
+
+    def run_forever(self):
+        for job in self.jobs.values():
+            slots = ", ".join(f"{h:02d}:{m:02d}" for h, m in job.times)
+            print(f"📅 {job.name}: daily at {slots} (overlap={job.overlap}, "
+                  f"jitter={job.jitter_seconds:.0f}s, catch-up={job.catch_up_seconds / 3600:.1f}h)")
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            print("\n🛑 Scheduler stopped")
@@ -0,0 +1,261 @@
+# ================================================================
+# SHARED HTTP CLIENT
+# Pooled keep-alive sessions with retries and request instrumentation
+# ================================================================
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from lazy_modules import LazyModule
+
+# Imported on the first request rather than at scheduler startup
+requests = LazyModule("requests")
+
+Timeout = Union[float, Tuple[float, float]]
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# A 5xx or a dropped connection may come after the server acted on the
+# request, so other methods (sendVideo, TTS, ...) are only retried when it
+# was provably not processed: a connect failure or a 429
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+UNPROCESSED_STATUSES = frozenset({429})
+
+# Endpoint -> (connect, read) timeout. An endpoint is "host/last-path-segment",
+# falling back to the bare host.
+DEFAULT_TIMEOUTS: Dict[str, Timeout] = {
+    'newsapi.org': (5, 10),
+    'api.elevenlabs.io': (5, 60),
+    'api.telegram.org': (5, 30),
+    'api.telegram.org/sendVideo': (5, 120),
+    'api.telegram.org/sendMediaGroup': (5, 60),
+}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Server retry hint from the Retry-After header or a Telegram-style body"""
+    header = response.headers.get('Retry-After')
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except Exception:
+        return None
+
+
+def never_sent(error: Exception) -> bool:
+    """True if a requests error happened before the request reached the server"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    from urllib3.exceptions import NewConnectionError
+
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def endpoint_of(url: str) -> str:
+    parts = urlsplit(url)
+    segment = parts.path.rstrip('/').rsplit('/', 1)[-1]
+    return f"{parts.netloc}/{segment}" if segment else parts.netloc
+
+
+class HttpClient:
+    """requests.Session wrapper shared by every outbound integration.
+
+    One pooled adapter per scheme keeps connections alive between calls to
+    the same host. Failed connections, timeouts, 429s and 5xx responses are
+    retried with jittered exponential backoff, honouring the server's retry
+    hint. Non-idempotent methods are retried only on connect failures and
+    429s, so a POST the server may have acted on is never sent twice.
+    Per-endpoint latency and the number of connections opened are recorded
+    so connection reuse can be checked.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, retries: int = 3,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 default_timeout: Timeout = (5, 30), timeouts: Optional[Dict[str, Timeout]] = None):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.default_timeout = default_timeout
+        self.timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self._adapters = []
+        for scheme in ('https://', 'http://'):
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+            self.session.mount(scheme, adapter)
+            self._adapters.append(adapter)
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def timeout_for(self, url: str) -> Timeout:
+        endpoint = endpoint_of(url)
+        host = urlsplit(url).netloc
+        return self.timeouts.get(endpoint, self.timeouts.get(host, self.default_timeout))
+
+    def _record(self, endpoint: str, latency: Optional[float], error: bool = False, retried: bool = False):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                'requests': 0, 'responses': 0, 'errors': 0, 'retries': 0,
+                'total_latency': 0.0, 'max_latency': 0.0
+            })
+            stats['requests'] += 1
+            stats['errors'] += int(error)
+            stats['retries'] += int(retried)
+            if latency is not None:
+                stats['responses'] += 1
+                stats['total_latency'] += latency
+                stats['max_latency'] = max(stats['max_latency'], latency)
+
+    @staticmethod
+    def _rewind(kwargs):
+        """Seek file bodies back to the start before a retry"""
+        bodies = list((kwargs.get('files') or {}).values()) + [kwargs.get('data')]
+        for body in bodies:
+            if isinstance(body, tuple):
+                body = body[1]
+            if hasattr(body, 'seek'):
+                body.seek(0)
+
+    def request(self, method: str, url: str, retries: Optional[int] = None,
+                timeout: Optional[Timeout] = None, retry_statuses=RETRY_STATUSES,
+                idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        retries = self.retries if retries is None else retries
+        timeout = timeout or self.timeout_for(url)
+        endpoint = endpoint_of(url)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if not idempotent:
+            retry_statuses = frozenset(retry_statuses) & UNPROCESSED_STATUSES
+
+        for attempt in range(retries + 1):
+            if attempt:
+                self._rewind(kwargs)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry = attempt < retries and (idempotent or never_sent(e))
+                self._record(endpoint, None, error=True, retried=retry)
+                if not retry:
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                continue
+
+            latency = time.perf_counter() - start
+            should_retry = response.status_code in retry_statuses and attempt < retries
+            self._record(endpoint, latency, error=response.status_code >= 400, retried=should_retry)
+            if not should_retry:
+                return response
+
+            delay = retry_after(response)
+            if delay is None:
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            response.close()
+            time.sleep(min(delay, self.backoff_cap))
+
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def connections_opened(self) -> int:
+        """New TCP (and TLS) connections made by the pools, i.e. handshakes paid"""
+        total = 0
+        for adapter in self._adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    total += pool.num_connections
+        return total
+
+    def stats(self) -> Dict:
+        with self._lock:
+            endpoints = {
+                endpoint: dict(s, mean_latency=s['total_latency'] / max(1, s['responses']))
+                for endpoint, s in self._stats.items()
+            }
+        return {
+            'requests': sum(s['requests'] for s in endpoints.values()),
+            'connections_opened': self.connections_opened(),
+            'endpoints': endpoints,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"  🌐 HTTP: {stats['requests']} requests over {stats['connections_opened']} connections")
+        for endpoint, s in sorted(stats['endpoints'].items()):
+            print(f"     {endpoint}: {s['requests']} req, {s['errors']} err, "
+                  f"mean {s['mean_latency'] * 1000:.0f}ms, max {s['max_latency'] * 1000:.0f}ms")
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Process-wide shared client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(
+                pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "16")),
+                retries=int(os.getenv("HTTP_RETRIES", "3")),
+            )
+        return _client
+
+
+if __name__ == "__main__":
+    # Self-check against a local keep-alive stub server
+    import sys
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/ping"
+
+    client = HttpClient()
+    for _ in range(num_requests):
+        client.get(url).json()
+    server.shutdown()
+
+    client.print_stats()
+    opened = client.connections_opened()
+    print(f"  {'✅' if opened == 1 else '❌'} {opened} connection(s) for {num_requests} requests")
+    sys.exit(0 if opened == 1 else 1)
@@ -0,0 +1,74 @@
+# ================================================================
+# IMPORT-TIME CHECK
+# Fails when importing a pipeline module gets slower than its budget
+# ================================================================
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Module -> budget in milliseconds for a cold `import <module>`
+DEFAULT_BUDGETS_MS = {
+    'ai_news_scheduler': float(os.getenv("IMPORT_BUDGET_SCHEDULER_MS", "400")),
+    'ai_news': float(os.getenv("IMPORT_BUDGET_COMIC_MS", "400")),
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Cumulative import time of module in ms, plus its slowest direct imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total_us = None
+    children = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == module and indent == 1:
+            total_us = cumulative
+        elif indent == 3:
+            children.append((cumulative / 1000, name))
+
+    if total_us is None:
+        raise RuntimeError(f"no importtime entry for {module}")
+    return total_us / 1000, sorted(children, reverse=True)[:5]
+
+
+def check(budgets: Dict[str, float], runs: int = 3) -> bool:
+    ok = True
+    print(f"\n⏱️ Import-time check (best of {runs})\n")
+    for module, budget in budgets.items():
+        best, slowest = min(measure_import(module) for _ in range(runs))
+        passed = best <= budget
+        ok &= passed
+        print(f"  {'✅' if passed else '❌'} {module}: {best:.0f}ms (budget {budget:.0f}ms)")
+        if not passed:
+            for ms, name in slowest:
+                print(f"       {name}: {ms:.0f}ms")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time regression check")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                        help="override a module budget, e.g. ai_news=300")
+    parser.add_argument("--runs", type=int, default=3, help="measurements per module")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for override in args.budget:
+        module, _, ms = override.partition("=")
+        budgets[module] = float(ms)
+
+    sys.exit(0 if check(budgets, args.runs) else 1)
@@ -0,0 +1,284 @@
+# ================================================================
+# INSTRUMENTATION
+# Metrics export, span timers and profiling shared by both news pipelines
+# ================================================================
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+METRICS_DIR = os.getenv("METRICS_DIR", "./cache/metrics")
+
+# (name, value, labels, help, type)
+Sample = Tuple[str, float, Optional[Dict[str, str]], str, str]
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+def write_prometheus_textfile(name: str, samples: Iterable[Sample], directory: str = METRICS_DIR) -> str:
+    """Atomically write samples to <directory>/<name>.prom for the node_exporter textfile collector"""
+    os.makedirs(directory, exist_ok=True)
+    lines = []
+    described = set()
+    for metric, value, labels, help_text, metric_type in samples:
+        if metric not in described:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            described.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+    path = os.path.join(directory, f"{name}.prom")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+# ================================================================
+# SPANS
+# ================================================================
+
+SPANS_PATH = os.getenv("SPANS_PATH", os.path.join(METRICS_DIR, "spans.jsonl"))  # "" disables JSON lines
+
+
+class SpanRecorder:
+    """Times named spans and keeps per-name totals.
+
+    Spans opened with emit=True are also appended to a JSON-lines file with
+    their wall-clock start, duration, parent span, status and attributes.
+    Per-frame spans pass emit=False and only update the totals, which are
+    exported as Prometheus counters.
+    """
+
+    def __init__(self, jsonl_path: str = SPANS_PATH):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._totals: Dict[str, List[float]] = {}  # name -> [count, seconds, max, errors]
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _add(self, name: str, count: float, seconds: float, longest: float, errors: float):
+        with self._lock:
+            totals = self._totals.get(name)
+            if totals is None:
+                self._totals[name] = [count, seconds, longest, errors]
+            else:
+                totals[0] += count
+                totals[1] += seconds
+                totals[2] = max(totals[2], longest)
+                totals[3] += errors
+
+    def _emit(self, record: Dict):
+        if not self.jsonl_path:
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.jsonl_path) or '.', exist_ok=True)
+                with open(self.jsonl_path, 'a') as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+    @contextlib.contextmanager
+    def span(self, name: str, emit: bool = True, **attrs) -> Iterator[None]:
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        started = time.time()
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            self._add(name, 1, seconds, seconds, status == 'error')
+            if emit:
+                self._emit({
+                    'ts': round(started, 6), 'span': name, 'seconds': round(seconds, 6),
+                    'parent': parent, 'status': status, 'pid': os.getpid(),
+                    'thread': threading.current_thread().name, **attrs,
+                })
+
+    def timed(self, name: str, emit: bool = True) -> Callable:
+        """Decorator form of span()"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, emit):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def totals(self) -> Dict[str, Tuple[float, float, float, float]]:
+        """name -> (count, seconds, max seconds, errors)"""
+        with self._lock:
+            return {name: tuple(values) for name, values in self._totals.items()}
+
+    def take_totals(self) -> Dict[str, Tuple[float, float, float, float]]:
+        """Return and clear the totals, e.g. to ship them from a worker process"""
+        with self._lock:
+            totals = {name: tuple(values) for name, values in self._totals.items()}
+            self._totals.clear()
+        return totals
+
+    def merge(self, totals: Dict[str, Tuple[float, float, float, float]]):
+        for name, (count, seconds, longest, errors) in totals.items():
+            self._add(name, count, seconds, longest, errors)
+
+    def export_prometheus(self, name: str, directory: str = METRICS_DIR) -> str:
+        samples: List[Sample] = []
+        for span_name, (count, seconds, longest, errors) in sorted(self.totals().items()):
+            labels = {'span': span_name}
+            samples += [
+                ("news_span_seconds_total", round(seconds, 6), labels, "Time spent inside the span", "counter"),
+                ("news_span_count_total", count, labels, "Times the span was entered", "counter"),
+                ("news_span_errors_total", errors, labels, "Spans that ended with an exception", "counter"),
+                ("news_span_max_seconds", round(longest, 6), labels, "Longest single span", "gauge"),
+            ]
+        return write_prometheus_textfile(name, samples, directory)
+
+    def print_summary(self, since: Optional[Dict[str, Tuple[float, float, float, float]]] = None, limit: int = 20):
+        """Per-span totals, optionally relative to an earlier totals() snapshot"""
+        since = since or {}
+        rows = []
+        for name, (count, seconds, _, errors) in self.totals().items():
+            base = since.get(name, (0, 0.0, 0.0, 0))
+            count, seconds, errors = count - base[0], seconds - base[1], errors - base[3]
+            if count:
+                rows.append((seconds, name, count, errors))
+        if not rows:
+            return
+
+        print("  ⏱️ Spans:")
+        for seconds, name, count, errors in sorted(rows, reverse=True)[:limit]:
+            suffix = f", {errors:.0f} failed" if errors else ""
+            print(f"     {name:<32} {seconds:8.2f}s over {count:.0f} call(s), "
+                  f"mean {seconds / count * 1000:.1f}ms{suffix}")
+
+
+SPANS = SpanRecorder()
+span = SPANS.span
+timed = SPANS.timed
+
+# ================================================================
+# PROFILING
+# ================================================================
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./cache/profiles")
+PROFILE_MODES = ("cprofile", "sample")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+_profile_mode = os.getenv("PROFILE", "")  # "", "cprofile" or "sample"
+
+
+def set_profile_mode(mode: str):
+    global _profile_mode
+    if mode and mode not in PROFILE_MODES:
+        raise ValueError(f"profile mode must be one of {PROFILE_MODES}, got {mode!r}")
+    _profile_mode = mode
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval.
+
+    Stacks are counted in the folded format ("outer;inner count") read by
+    flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    @staticmethod
+    def _fold(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[self._fold(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextlib.contextmanager
+def profile_section(name: str, mode: Optional[str] = None, directory: str = PROFILE_DIR) -> Iterator[None]:
+    """Profile the enclosed block of the current thread when profiling is enabled.
+
+    "cprofile" writes <name>-<time>.pstats (view with snakeviz or convert with
+    flameprof); "sample" writes <name>-<time>.folded for flame graphs.
+    """
+    mode = _profile_mode if mode is None else mode
+    if not mode:
+        yield
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d_%H%M%S')}")
+    if mode == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = f"{base}.pstats"
+            profiler.dump_stats(path)
+            print(f"  🔥 cProfile data written to {path}")
+    elif mode == "sample":
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            path = f"{base}.folded"
+            profiler.write_folded(path)
+            print(f"  🔥 {sum(profiler.counts.values())} stack samples written to {path}")
+    else:
+        raise ValueError(f"profile mode must be one of {PROFILE_MODES}, got {mode!r}")
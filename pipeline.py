@@ -0,0 +1,209 @@
+# ================================================================
+# STAGE PIPELINE
+# Checkpointed DAG of workflow stages with resume after failures
+# ================================================================
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from instrumentation import span
+
+
+class StageError(Exception):
+    """Raised by a stage to stop the run with a message instead of a traceback"""
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Stage:
+    """One node of a StagePipeline.
+
+    `func` receives the outputs of `deps` as keyword arguments and returns a
+    JSON-serializable output. `artifacts(output)` lists the files the output
+    refers to; their digests are part of the checkpoint, so a deleted or
+    modified file invalidates it. Bump `version` when the stage's logic
+    changes in a way that should discard old checkpoints.
+    """
+
+    def __init__(self, name: str, func: Callable[..., Any], deps: Sequence[str] = (),
+                 version: str = "1", checkpoint: bool = True,
+                 artifacts: Optional[Callable[[Any], Iterable[str]]] = None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.version = version
+        self.checkpoint = checkpoint
+        self.artifacts = artifacts
+
+
+class StagePipeline:
+    """Runs stages as soon as their dependencies finish, checkpointing each result.
+
+    A stage's checkpoint is keyed by its name, version and the content hashes
+    of its inputs. Re-running the same run id skips every stage whose key
+    still matches, so a retry resumes at the first incomplete stage. Stages
+    without a path between them run concurrently.
+    """
+
+    def __init__(self, stages: List[Stage], checkpoint_dir: str, max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.checkpoint_dir = checkpoint_dir
+        self.max_workers = max_workers
+        self.timings: Dict[str, float] = {}
+        self.wall_time = 0.0
+
+        for stage in stages:
+            unknown = [dep for dep in stage.deps if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"stage {stage.name} depends on unknown stages {unknown}")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"stage graph has a cycle through {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run_dir(self, run_id: str) -> str:
+        path = os.path.join(self.checkpoint_dir, run_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _checkpoint_path(self, run_id: str, stage: Stage) -> str:
+        return os.path.join(self.run_dir(run_id), f"{stage.name}.json")
+
+    @staticmethod
+    def _input_key(stage: Stage, records: Dict[str, Dict]) -> str:
+        digest = hashlib.sha1(f"{stage.name}\0{stage.version}".encode())
+        for dep in stage.deps:
+            digest.update(f"\0{dep}={records[dep]['output_hash']}".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _output_hash(output: Any, artifacts: Dict[str, str]) -> str:
+        payload = json.dumps([output, sorted(artifacts.items())], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _load_checkpoint(self, run_id: str, stage: Stage, key: str) -> Optional[Dict]:
+        try:
+            with open(self._checkpoint_path(run_id, stage)) as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if record.get('key') != key:
+            return None
+        for path, digest in record.get('artifacts', {}).items():
+            if not os.path.exists(path) or file_digest(path) != digest:
+                return None
+        return record
+
+    def _save_checkpoint(self, run_id: str, stage: Stage, record: Dict):
+        path = self._checkpoint_path(run_id, stage)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp_path, path)
+
+    def _run_stage(self, run_id: str, stage: Stage, records: Dict[str, Dict]) -> Dict:
+        key = self._input_key(stage, records)
+        if stage.checkpoint:
+            record = self._load_checkpoint(run_id, stage, key)
+            if record:
+                print(f"  ♻️ {stage.name}: resumed from checkpoint")
+                return record
+
+        print(f"  ▶️ {stage.name}: started")
+        start = time.perf_counter()
+        with span(f"stage.{stage.name}", run_id=run_id):
+            output = stage.func(**{dep: records[dep]['output'] for dep in stage.deps})
+        elapsed = time.perf_counter() - start
+        self.timings[stage.name] = elapsed
+
+        artifacts = {path: file_digest(path) for path in (stage.artifacts(output) if stage.artifacts else [])}
+        record = {
+            'key': key,
+            'output': output,
+            'output_hash': self._output_hash(output, artifacts),
+            'artifacts': artifacts,
+            'seconds': elapsed,
+            'completed_at': time.time(),
+        }
+        if stage.checkpoint:
+            self._save_checkpoint(run_id, stage, record)
+        print(f"  ✅ {stage.name}: done in {elapsed:.1f}s")
+        return record
+
+    def run(self, run_id: str) -> Dict[str, Any]:
+        """Run or resume run_id; returns the outputs of the stages that completed"""
+        self.timings = {}
+        start = time.perf_counter()
+        records: Dict[str, Dict] = {}
+        failed = set()
+        pending = dict(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if any(dep in failed for dep in stage.deps):
+                        print(f"  ⏭️ {name}: skipped")
+                        failed.add(name)
+                        del pending[name]
+                    elif all(dep in records for dep in stage.deps):
+                        running[pool.submit(self._run_stage, run_id, stage, records)] = stage
+                        del pending[name]
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        records[stage.name] = future.result()
+                    except StageError as e:
+                        print(f"  ❌ {stage.name}: {e}")
+                        failed.add(stage.name)
+                    except Exception as e:
+                        print(f"  ❌ {stage.name} error: {e}")
+                        traceback.print_exc()
+                        failed.add(stage.name)
+
+        self.wall_time = time.perf_counter() - start
+        return {name: record['output'] for name, record in records.items()}
+
+    def prune(self, keep_days: float) -> int:
+        """Delete run directories untouched for keep_days; returns the number removed"""
+        if not os.path.isdir(self.checkpoint_dir):
+            return 0
+        cutoff = time.time() - keep_days * 86400
+        removed = 0
+        for entry in os.scandir(self.checkpoint_dir):
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed